@@ -8,6 +8,12 @@ to align with highway-env observation space.
 import pandas as pd
 import numpy as np
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# Shared HighD helpers live in highd_io.py at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from highd_io import HIGHD_INT_DTYPES
 
 # 1. Set base paths
 base_data_dir = './data/highD-dataset-v1.0'                  # HighD dataset directory
@@ -18,13 +24,23 @@ merged_output = './output/merged_all_scenarios.csv'          # Merged all scenar
 
 os.makedirs(message_dir, exist_ok=True)
 
-# Record processing statistics
-summary_stats = []
+MAX_WORKERS = None    # Worker processes for recordings (None uses all CPU cores)
+
+# State columns needed for alignment
+STATE_COLUMNS = ['frame', 'id', 'x', 'y', 'xVelocity', 'laneId']
+
+# Lane difference adjustment notes, indexed by direction code
+ADJUSTMENT_NOTES = ["reverse direction (direction=1)", "forward direction (direction=2)", "unknown direction"]
 
-# 2. Process all 60 recording files
-for file_num in range(1, 61):
+
+# 2. Process a single recording file
+def process_recording(file_num):
+    """Align cut-in and victim initial states of a single recording, return aligned data, statistics and messages"""
     file_num_str = f"{file_num:02d}"
-    print(f"\nProcessing recording {file_num_str}...")
+
+    # Messages are collected and printed by the main process in recording order
+    log = []
+    log.append(f"\nProcessing recording {file_num_str}...")
 
     # Build file paths
     file1_path = os.path.join(cutin_initial_dir, f'cut_in_trajectories_{file_num_str}_initial_state.csv')
@@ -34,118 +50,120 @@ for file_num in range(1, 61):
 
     # Check files
     if not all(os.path.exists(f) for f in [file1_path, file2_path, tracks_meta_path]):
-        print(f"Files missing, skipping recording {file_num_str}")
-        continue
+        log.append(f"Files missing, skipping recording {file_num_str}")
+        return None, None, log
 
-    # Read files
+    # Read files (positions and velocities stay float64 for the relative state arithmetic)
     try:
-        df1 = pd.read_csv(file1_path)
-        df2 = pd.read_csv(file2_path)
-        tracks_meta = pd.read_csv(tracks_meta_path)
+        df1 = pd.read_csv(file1_path, usecols=STATE_COLUMNS, dtype=HIGHD_INT_DTYPES)
+        df2 = pd.read_csv(file2_path, usecols=STATE_COLUMNS, dtype=HIGHD_INT_DTYPES)
+        tracks_meta = pd.read_csv(tracks_meta_path, usecols=['id', 'drivingDirection'], dtype=HIGHD_INT_DTYPES)
     except Exception as e:
-        print(f"Failed to read: {e}")
-        continue
+        log.append(f"Failed to read: {e}")
+        return None, None, log
 
     # Find common frames
-    common_frames = set(df1['frame']).intersection(set(df2['frame']))
+    common_frames = np.intersect1d(df1['frame'].to_numpy(), df2['frame'].to_numpy())
     if len(common_frames) == 0:
-        print(f"No common frames, skipping")
-        continue
+        log.append(f"No common frames, skipping")
+        return None, None, log
 
-    # Extract data for common frames
-    df1_common = df1[df1['frame'].isin(common_frames)].sort_values('frame').reset_index(drop=True)
-    df2_common = df2[df2['frame'].isin(common_frames)].sort_values('frame').reset_index(drop=True)
+    # Extract data for common frames (rows sharing a frame keep their order in the file)
+    df1_common = df1.loc[df1['frame'].isin(common_frames), STATE_COLUMNS].sort_values('frame', kind='stable')
+    df2_common = df2.loc[df2['frame'].isin(common_frames), STATE_COLUMNS].sort_values('frame', kind='stable')
 
-    # Get driving direction
-    unique_ids = df1_common['id'].unique()
-    id_to_direction = {}
-    for vehicle_id in unique_ids:
-        meta_row = tracks_meta[tracks_meta['id'] == vehicle_id]
-        id_to_direction[vehicle_id] = meta_row.iloc[0]['drivingDirection'] if len(meta_row) > 0 else None
-
-    # Align and compute differences
-    aligned_data = []
+    # Pair rows by position, keeping only positions where both vehicles are on the same frame
     min_length = min(len(df1_common), len(df2_common))
+    df1_common, df2_common = df1_common.iloc[:min_length], df2_common.iloc[:min_length]
+    same_frame = df1_common['frame'].to_numpy() == df2_common['frame'].to_numpy()
+    if not same_frame.any():
+        log.append(f"No aligned data")
+        return None, None, log
 
-    for idx in range(min_length):
-        row1, row2 = df1_common.iloc[idx], df2_common.iloc[idx]
-
-        if row1['frame'] != row2['frame']:
-            continue
-
-        x_diff = abs(row1['x'] - row2['x'])
-        y_diff = row1['y'] - row2['y']
-        xVelocity_diff = row1['xVelocity'] - row2['xVelocity']
-        laneId_diff = row1['laneId'] - row2['laneId']
-
-        direction = id_to_direction.get(row1['id'])
-        if direction == 1:
-            adjusted_laneId_diff = -laneId_diff
-            adjustment_note = "reverse direction (direction=1)"
-        elif direction == 2:
-            adjusted_laneId_diff = laneId_diff
-            adjustment_note = "forward direction (direction=2)"
-        else:
-            adjusted_laneId_diff = laneId_diff
-            adjustment_note = "unknown direction"
-
-        aligned_data.append({
-            'recording_id': file_num_str,
-            'frame': row1['frame'],
-            'cut_in_vehicle_id': row1['id'],
-            'target_vehicle_id': row2['id'],
-            'x_cut_in': row1['x'], 'y_cut_in': row1['y'],
-            'x_target': row2['x'], 'y_target': row2['y'],
-            'x_diff_abs': x_diff, 'y_diff': y_diff,
-            'xVelocity_cut_in': row1['xVelocity'], 'xVelocity_target': row2['xVelocity'],
-            'xVelocity_diff': xVelocity_diff,
-            'laneId_cut_in': row1['laneId'], 'laneId_target': row2['laneId'],
-            'laneId_diff': laneId_diff, 'adjusted_laneId_diff': adjusted_laneId_diff,
-            'driving_direction': direction, 'adjustment_note': adjustment_note
-        })
+    merged = pd.concat([df1_common[same_frame].reset_index(drop=True).add_suffix('_cut_in'),
+                        df2_common[same_frame].reset_index(drop=True).add_suffix('_target')], axis=1)
+
+    # Get driving direction
+    id_to_direction = tracks_meta.set_index('id')['drivingDirection'].to_dict()
+
+    # Compute differences and assemble output columns
+    frame = merged['frame_cut_in'].to_numpy()
+    x_cut_in, x_target = merged['x_cut_in'].to_numpy(), merged['x_target'].to_numpy()
+    y_cut_in, y_target = merged['y_cut_in'].to_numpy(), merged['y_target'].to_numpy()
+    xVelocity_cut_in, xVelocity_target = merged['xVelocity_cut_in'].to_numpy(), merged['xVelocity_target'].to_numpy()
+    laneId_cut_in, laneId_target = merged['laneId_cut_in'].to_numpy(), merged['laneId_target'].to_numpy()
+    laneId_diff = laneId_cut_in.astype(np.int16) - laneId_target
+
+    driving_direction = merged['id_cut_in'].map(id_to_direction).to_numpy()
+    direction_code = np.select([driving_direction == 1, driving_direction == 2], [0, 1], default=2)
+
+    aligned_df = pd.DataFrame({
+        'recording_id': np.full(len(frame), file_num_str),
+        'frame': frame,
+        'cut_in_vehicle_id': merged['id_cut_in'].to_numpy(),
+        'target_vehicle_id': merged['id_target'].to_numpy(),
+        'x_cut_in': x_cut_in, 'y_cut_in': y_cut_in,
+        'x_target': x_target, 'y_target': y_target,
+        'x_diff_abs': np.abs(x_cut_in - x_target), 'y_diff': y_cut_in - y_target,
+        'xVelocity_cut_in': xVelocity_cut_in, 'xVelocity_target': xVelocity_target,
+        'xVelocity_diff': xVelocity_cut_in - xVelocity_target,
+        'laneId_cut_in': laneId_cut_in, 'laneId_target': laneId_target,
+        'laneId_diff': laneId_diff, 'adjusted_laneId_diff': np.where(direction_code == 0, -laneId_diff, laneId_diff),
+        'driving_direction': driving_direction,
+        'adjustment_note': pd.Categorical.from_codes(direction_code, ADJUSTMENT_NOTES)
+    })
 
     # Save results
-    if aligned_data:
-        aligned_df = pd.DataFrame(aligned_data)
-        aligned_df.to_csv(output_path, index=False)
-
-        summary_stats.append({
-            'recording': file_num_str,
-            'status': 'success',
-            'aligned_rows': len(aligned_df),
-            'x_diff_mean': aligned_df['x_diff_abs'].mean()
-        })
-        print(f"Saved: {output_path} ({len(aligned_df)} rows)")
+    aligned_df.to_csv(output_path, index=False)
+
+    stats = {
+        'recording': file_num_str,
+        'status': 'success',
+        'aligned_rows': len(aligned_df),
+        'x_diff_mean': aligned_df['x_diff_abs'].mean()
+    }
+    log.append(f"Saved: {output_path} ({len(aligned_df)} rows)")
+
+    return aligned_df, stats, log
+
+
+def main():
+    """Process all 60 recording files in parallel, then merge and summarize"""
+    summary_stats = []
+
+    # 3. Merge aligned scenarios of all recordings
+    # Each recording is appended to the merged file as soon as it is available
+    merged_rows = 0
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for aligned_df, stats, log in executor.map(process_recording, range(1, 61)):
+            print('\n'.join(log))
+
+            if aligned_df is None:
+                continue
+
+            # The recording ID is written as a plain integer, as when read back from the message file
+            aligned_df = aligned_df.assign(recording_id=int(stats['recording']))
+            aligned_df.to_csv(merged_output, mode='w' if merged_rows == 0 else 'a',
+                              header=merged_rows == 0, index=False)
+            merged_rows += len(aligned_df)
+            summary_stats.append(stats)
+
+    if merged_rows > 0:
+        print(f"\nMerge complete! Total rows: {merged_rows}")
+        print(f"Saved to: {merged_output}")
     else:
-        print(f"No aligned data")
-
-# 3. Merge all message files
-print(f"\nMerging all CSV files in message directory...")
-all_files = [f for f in os.listdir(message_dir) if f.endswith('.csv') and f.startswith('message_cutin_')]
-all_files.sort()
-
-if all_files:
-    dataframes = []
-    for filename in all_files:
-        file_path = os.path.join(message_dir, filename)
-        df = pd.read_csv(file_path)
-        dataframes.append(df)
-        print(f"Read: {filename} ({len(df)} rows)")
-
-    merged = pd.concat(dataframes, ignore_index=True)
-    merged.to_csv(merged_output, index=False)
-
-    print(f"\nMerge complete! Total rows: {len(merged)}")
-    print(f"Saved to: {merged_output}")
-else:
-    print(f"No CSV files found in message directory")
-
-# 4. Generate processing summary
-if summary_stats:
-    summary_df = pd.DataFrame(summary_stats)
-    summary_path = os.path.join(message_dir, "processing_summary.csv")
-    summary_df.to_csv(summary_path, index=False)
-
-    success_count = len([s for s in summary_stats if s['status'] == 'success'])
-    print(f"\nProcessing complete: {success_count} successful, {len(summary_stats) - success_count} failed")
-    print(f"Summary saved: {summary_path}")
\ No newline at end of file
+        print(f"No aligned scenarios to merge")
+
+    # 4. Generate processing summary
+    if summary_stats:
+        summary_df = pd.DataFrame(summary_stats)
+        summary_path = os.path.join(message_dir, "processing_summary.csv")
+        summary_df.to_csv(summary_path, index=False)
+
+        success_count = len([s for s in summary_stats if s['status'] == 'success'])
+        print(f"\nProcessing complete: {success_count} successful, {len(summary_stats) - success_count} failed")
+        print(f"Summary saved: {summary_path}")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
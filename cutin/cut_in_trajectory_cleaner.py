@@ -7,6 +7,12 @@ for scenario-specific analysis or outlier removal.
 
 import pandas as pd
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# Shared HighD helpers live in highd_io.py at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from highd_io import HIGHD_DTYPES
 
 # 1. Define file path
 data_dir = "./output/cutin_trajectories"                # Directory containing extracted cut-in trajectories
@@ -16,55 +22,74 @@ os.makedirs(output_dir, exist_ok=True)
 # Configurable parameters
 MIN_SPEED = 20  # Minimum speed threshold in m/s (adjustable)
 MAX_SPEED = 35  # Maximum speed threshold in m/s (adjustable)
+MAX_WORKERS = None  # Worker processes for files (None uses all CPU cores)
 
-# 2. Get all files
-cut_in_files = [f for f in os.listdir(data_dir) if 'cut_in_trajectories_' in f and f.endswith('.csv')]
-print(f"Found {len(cut_in_files)} cut-in trajectory files")
 
-# 3. Process each file
-for i, file_name in enumerate(cut_in_files, 1):
-    print(f"\n[{i}/{len(cut_in_files)}] Processing file: {file_name}")
+# 2. Process a single file
+def process_file(file_name):
+    """Filter one cut-in trajectory file by speed range, return number of remaining vehicles and messages"""
+    # Messages are collected and printed by the main process in file order
+    log = []
 
     file_path = os.path.join(data_dir, file_name)
-    df = pd.read_csv(file_path)
-    print(f"Original data: {len(df)} rows, {df['id'].nunique()} vehicles")
+    df = pd.read_csv(file_path, dtype=HIGHD_DTYPES)
+    log.append(f"Original data: {len(df)} rows, {df['id'].nunique()} vehicles")
 
-    # 4. Filter vehicles by speed range
+    # 3. Filter vehicles by speed range
     # Adjust MIN_SPEED and MAX_SPEED as needed for your analysis
-    df['speed_abs'] = df['xVelocity'].abs()
-    slow_ids = df[df['speed_abs'] < MIN_SPEED]['id'].unique().tolist()
-    fast_ids = df[df['speed_abs'] > MAX_SPEED]['id'].unique().tolist()
-
-    # Merge IDs to remove
-    ids_to_remove = list(set(slow_ids + fast_ids))
+    speed_abs = df['xVelocity'].abs()
+    speed_range = speed_abs.groupby(df['id']).agg(['min', 'max'])
+    slow = speed_range['min'] < MIN_SPEED
+    fast = speed_range['max'] > MAX_SPEED
 
-    # Remove all records for these IDs
-    df_filtered = df[~df['id'].isin(ids_to_remove)].copy()
+    # Keep all records of vehicles without abnormal speed
+    keep = ~(slow | fast)
+    df_filtered = df[df['id'].map(keep).to_numpy()]
 
-    print(f" Removed {len(slow_ids)} low-speed vehicles")
-    print(f" Removed {len(fast_ids)} high-speed vehicles")
-    print(f" Total removed: {len(ids_to_remove)} abnormal-speed vehicles")
-    print(f" After filtering: {len(df_filtered)} rows, {df_filtered['id'].nunique()} vehicles")
+    log.append(f" Removed {slow.sum()} low-speed vehicles")
+    log.append(f" Removed {fast.sum()} high-speed vehicles")
+    log.append(f" Total removed: {(~keep).sum()} abnormal-speed vehicles")
+    log.append(f" After filtering: {len(df_filtered)} rows, {keep.sum()} vehicles")
 
-    # 5. Validation
+    # 4. Validation
     if len(df_filtered) > 0:
-        df_filtered['speed_abs'] = df_filtered['xVelocity'].abs()
-        min_speed_abs = df_filtered['speed_abs'].min()
-        max_speed_abs = df_filtered['speed_abs'].max()
+        min_speed_abs = speed_range.loc[keep, 'min'].min()
+        max_speed_abs = speed_range.loc[keep, 'max'].max()
 
         if min_speed_abs >= MIN_SPEED and max_speed_abs <= MAX_SPEED:
-            print(f" Validation passed: speed range = [{min_speed_abs:.2f}, {max_speed_abs:.2f}] m/s")
+            log.append(f" Validation passed: speed range = [{min_speed_abs:.2f}, {max_speed_abs:.2f}] m/s")
         else:
-            print(f" Validation failed: speed range = [{min_speed_abs:.2f}, {max_speed_abs:.2f}] m/s")
+            log.append(f" Validation failed: speed range = [{min_speed_abs:.2f}, {max_speed_abs:.2f}] m/s")
     else:
-        print("Warning: Data empty after filtering!")
+        log.append("Warning: Data empty after filtering!")
 
-    # 6. Save filtered file
+    # 5. Save filtered file
     output_file = file_name.replace('.csv', '_filtered.csv')
     output_path = os.path.join(output_dir, output_file)
 
     df_filtered.to_csv(output_path, index=False)
-    print(f"Saved: {output_file}")
+    log.append(f"Saved: {output_file}")
+
+    return int(keep.sum()), log
+
+
+def main():
+    """Filter all cut-in trajectory files in parallel"""
+
+    # 6. Get all files and process them
+    cut_in_files = [f for f in os.listdir(data_dir) if 'cut_in_trajectories_' in f and f.endswith('.csv')]
+    print(f"Found {len(cut_in_files)} cut-in trajectory files")
+
+    vehicle_counts = []
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for i, (file_name, (vehicle_count, log)) in enumerate(zip(cut_in_files, executor.map(process_file, cut_in_files)), 1):
+            print(f"\n[{i}/{len(cut_in_files)}] Processing file: {file_name}")
+            print('\n'.join(log))
+            vehicle_counts.append(vehicle_count)
+
+    print(f"\nAll files processed! {sum(vehicle_counts)} vehicles kept")
+    print(f"Filtered files saved in: {output_dir}")
+
 
-print(f"\nAll files processed!")
-print(f"Filtered files saved in: {output_dir}")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
\ No newline at end of file
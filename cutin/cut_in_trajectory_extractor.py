@@ -8,21 +8,99 @@ and overtaking the victim vehicle, with specified pre- and post-maneuver frames.
 import pandas as pd
 import numpy as np
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# Shared HighD helpers live in highd_io.py at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from highd_io import HIGHD_DTYPES, load_tracks
 
 # 1. Set base data directories
 base_data_dir = './data/highD-dataset-v1.0'      # HighD dataset directory
 save_dir = './output/cutin_trajectories'         # Directory for saving cut-in vehicle trajectories
+cache_dir = './output/tracks_cache'              # Directory for caching parsed HighD tracks
 os.makedirs(save_dir, exist_ok=True)
+os.makedirs(cache_dir, exist_ok=True)
 
 # Cut-in extraction parameters
 PRE_FRAMES = 25      # Frames before cut-in
 POST_FRAMES = 25     # Frames after cut-in
+MAX_WORKERS = None   # Worker processes for recordings (None uses all CPU cores)
+
+# Metadata columns used for candidate selection
+META_COLUMNS = ['id', 'class', 'numLaneChanges']
+
+
+# Helper function: Find the cut-in segment of a single vehicle
+def find_cut_in_segment(frames, left_preceding, right_preceding, left_alongside, right_alongside, following, lanes):
+    """Return (start, end) row indices of the first cut-in segment, or None if the vehicle does not cut in"""
+    # Identify the vehicle that may be cut in on (victim vehicle): the preceding vehicle in adjacent lane
+    victim_ids = np.where(left_preceding > 0, left_preceding, right_preceding)
+
+    # Only frames with a preceding vehicle in adjacent lane are checked
+    for i_idx in np.flatnonzero(victim_ids > 0):
+        victim_id = victim_ids[i_idx]
 
-# 2. Process all recording files (01-60)
-for file_num in range(1, 61):
+        # Check if victim vehicle appears behind target vehicle in future frames
+        following_idx = np.flatnonzero(following[i_idx + 1:] == victim_id) + i_idx + 1
+        if len(following_idx) == 0:
+            continue
+
+        # Find frames where vehicles are side by side
+        if victim_id == left_preceding[i_idx]:
+            along_side_idx = np.flatnonzero(left_alongside[i_idx + 1:] == victim_id) + i_idx + 1
+        else:
+            along_side_idx = np.flatnonzero(right_alongside[i_idx + 1:] == victim_id) + i_idx + 1
+
+        if len(along_side_idx) == 0:
+            continue
+
+        along_side_frame = frames[along_side_idx[0]]
+
+        # Find cut-in start frame
+        start_frame = along_side_frame - PRE_FRAMES
+
+        start_index = np.searchsorted(frames, start_frame, side='left')
+        if start_index == len(frames):
+            continue
+
+        # Find cut-in completion frame
+        cut_complete_index = following_idx[0]
+        cut_complete_frame = frames[cut_complete_index]
+
+        planned_end_frame = cut_complete_frame + POST_FRAMES
+        actual_end_index = np.searchsorted(frames, planned_end_frame, side='right') - 1
+        if actual_end_index < 0:
+            continue
+        actual_end_frame = frames[actual_end_index]
+
+        # Check if trajectory meets frame count requirements
+        if actual_end_frame < planned_end_frame:
+            continue
+
+        # Detect lane change within the frame window
+        lane_change_detected = np.any(np.diff(lanes[cut_complete_index:actual_end_index + 1]) != 0)
+
+        if lane_change_detected:
+            continue
+
+        # The first matching candidate decides; an inverted window yields no segment
+        if start_index <= actual_end_index:
+            return start_index, actual_end_index
+        return None
+
+    return None
+
+
+# 2. Process a single recording file
+def process_recording(file_num):
+    """Extract cut-in trajectories of a single recording, return number of cut-in events and messages"""
 
     file_num_str = f"{file_num:02d}"
 
+    # Messages are collected and printed by the main process in recording order
+    log = []
+
     # Build file paths
     tracksMeta_path = os.path.join(base_data_dir, f"{file_num_str}_tracksMeta.csv")
     tracks_path = os.path.join(base_data_dir, f"{file_num_str}_tracks.csv")
@@ -30,123 +108,81 @@ for file_num in range(1, 61):
     # Create separate save path for each recording
     save_path = os.path.join(save_dir, f'cut_in_trajectories_{file_num_str}.csv')
 
-    print(f"\nProcessing recording {file_num_str}...")
+    log.append(f"\nProcessing recording {file_num_str}...")
 
     # Check if files exist
     if not os.path.exists(tracksMeta_path) or not os.path.exists(tracks_path):
-        print(f"Skipped: Files not found")
-        continue
+        log.append(f"Skipped: Files not found")
+        return 0, log
 
     # Read data
     try:
-        meta = pd.read_csv(tracksMeta_path)
-        tracks = pd.read_csv(tracks_path)
+        meta = pd.read_csv(tracksMeta_path, usecols=META_COLUMNS, dtype=HIGHD_DTYPES)
+        tracks = load_tracks(tracks_path, cache_dir)
     except Exception as e:
-        print(f"Failed to read: {e}")
-        continue
+        log.append(f"Failed to read: {e}")
+        return 0, log
 
     # 3. Select candidate vehicles from metadata
     # Vehicles must be cars and have exactly one recorded lane change
     target_ids = meta[(meta['class'] == 'Car') & (meta['numLaneChanges'] == 1)]['id'].tolist()
+    tracks = tracks[tracks['id'].isin(target_ids)]
+
+    # Split trajectories by vehicle once, each already sorted by frame
+    tracks = tracks.sort_values(['id', 'frame'], kind='stable').reset_index(drop=True)
+    vehicle_tracks = dict(iter(tracks.groupby('id', sort=False)))
 
-    cut_in_data = []
+    # Row ranges (first, last) of cut-in segments in the sorted tracks
+    cut_in_events = []
 
     # 4. Check each vehicle for cut-in behavior and extract precise trajectory segments
     for vid in target_ids:
-        df = tracks[tracks['id'] == vid].sort_values('frame')
-        df = df.reset_index(drop=True)
+        df = vehicle_tracks.get(vid)
 
-        if len(df) == 0:
+        if df is None:
             continue
 
-        for i_idx in range(len(df)):
-            current_row = df.iloc[i_idx]
-
-            # Check if there is a preceding vehicle in adjacent lane
-            if current_row['leftPrecedingId'] > 0 or current_row['rightPrecedingId'] > 0:
-                # Identify the vehicle that is being cut-in (victim vehicle)
-                victim_id = current_row['leftPrecedingId'] if current_row['leftPrecedingId'] > 0 else current_row[
-                    'rightPrecedingId']
-
-                # Check if victim vehicle appears behind target vehicle in future frames
-                future_rows = df.iloc[i_idx + 1:]
-                if not future_rows.empty and (future_rows['followingId'] == victim_id).any():
-                    # Find frames where vehicles are side by side
-                    if victim_id == current_row['leftPrecedingId']:
-                        along_side_rows = future_rows[future_rows['leftAlongsideId'] == victim_id]
-                    else:
-                        along_side_rows = future_rows[future_rows['rightAlongsideId'] == victim_id]
-
-                    if along_side_rows.empty:
-                        continue
-
-                    along_side_row = along_side_rows.iloc[0]
-                    along_side_frame = along_side_row['frame']
-
-                    # Find cut-in start frame
-                    start_frame = along_side_frame - PRE_FRAMES
-
-                    start_frames = df[df['frame'] >= start_frame]
-                    if start_frames.empty:
-                        continue
-                    start_row = start_frames.iloc[0]
-                    start_index = start_row.name
-
-                    # Find cut-in completion frame
-                    cut_completed_frames = future_rows[future_rows['followingId'] == victim_id]
-                    if not cut_completed_frames.empty:
-                        cut_complete_row = cut_completed_frames.iloc[0]
-                        cut_complete_frame = cut_complete_row['frame']
-                        cut_complete_index = cut_complete_row.name
-
-                        planned_end_frame = cut_complete_frame + POST_FRAMES
-                        end_frames = df[df['frame'] <= planned_end_frame]
-                        if end_frames.empty:
-                            continue
-                        end_row = end_frames.iloc[-1]
-                        actual_end_index = end_row.name
-                        actual_end_frame = end_row['frame']
-
-                        # Check if trajectory meets frame count requirements
-                        if actual_end_frame < planned_end_frame:
-                            continue
-
-                        # Detect lane change within the frame window
-                        lane_change_detected = False
-                        for k in range(cut_complete_index + 1, actual_end_index + 1):
-                            if k >= len(df):
-                                break
-                            row_k = df.iloc[k]
-                            row_k_prev = df.iloc[k - 1]
-                            if row_k['laneId'] != row_k_prev['laneId']:
-                                lane_change_detected = True
-                                break
-
-                        if lane_change_detected:
-                            continue
-
-                        # Extract cut-in vehicle trajectory segment
-                        cut_in_vehicle_segment = df[(df['frame'] >= start_frame) & (df['frame'] <= actual_end_frame)]
-
-                        if not cut_in_vehicle_segment.empty:
-                            cut_in_data.append(cut_in_vehicle_segment)
-
-                        break
+        segment = find_cut_in_segment(df['frame'].to_numpy(),
+                                      df['leftPrecedingId'].to_numpy(), df['rightPrecedingId'].to_numpy(),
+                                      df['leftAlongsideId'].to_numpy(), df['rightAlongsideId'].to_numpy(),
+                                      df['followingId'].to_numpy(), df['laneId'].to_numpy())
+
+        # Record cut-in vehicle trajectory segment
+        if segment is not None:
+            row_offset = df.index[0]
+            cut_in_events.append((row_offset + segment[0], row_offset + segment[1]))
 
     # 5. Save results for current recording file
-    if cut_in_data:
-        result = pd.concat(cut_in_data)
-        result = result.sort_values(['id', 'frame'])
+    if cut_in_events:
+        # Gather all segments at once, rows stay ordered by id and frame
+        rows = np.sort(np.concatenate([np.arange(first, last + 1) for first, last in cut_in_events]))
+        result = tracks.iloc[rows]
         result.to_csv(save_path, index=False)
 
         # Statistics
         unique_vehicles = result['id'].nunique()
-        unique_interactions = len(cut_in_data)
-        print(f" Saved {unique_interactions} cut-in events")
-        print(f" Involves {unique_vehicles} different vehicles")
-        print(f" Total trajectory length: {len(result)} rows")
-        print(f" Saved to: {save_path}")
+        unique_interactions = len(cut_in_events)
+        log.append(f" Saved {unique_interactions} cut-in events")
+        log.append(f" Involves {unique_vehicles} different vehicles")
+        log.append(f" Total trajectory length: {len(result)} rows")
+        log.append(f" Saved to: {save_path}")
     else:
-        print(f"No cut-in behavior found")
+        log.append(f"No cut-in behavior found")
+
+    return len(cut_in_events), log
+
+
+def main():
+    """Process all recording files (01-60) in parallel"""
+    event_counts = []
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for event_count, log in executor.map(process_recording, range(1, 61)):
+            print('\n'.join(log))
+            event_counts.append(event_count)
+
+    print(f"\nAll recording files processed! Found {sum(event_counts)} cut-in events")
+    print(f"Results saved in: {save_dir}")
+
 
-print(f"\nAll recording files processed! Results saved in: {save_dir}")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
\ No newline at end of file
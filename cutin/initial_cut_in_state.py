@@ -6,6 +6,11 @@ For each detected cut-in event, extract the vehicle's state information at the m
 
 import pandas as pd
 import os
+import sys
+
+# Shared HighD helpers live in highd_io.py at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from highd_io import HIGHD_DTYPES
 
 # 1. Set base data directories
 input_folder = './output/cutin_trajectories'                # Directory for saving cut-in vehicle trajectories
@@ -20,33 +25,21 @@ for file_name in os.listdir(input_folder):
         input_path = os.path.join(input_folder, file_name)
 
         try:
-            df = pd.read_csv(input_path)
+            df = pd.read_csv(input_path, dtype=HIGHD_DTYPES)
             print(f"Processing cut-in trajectory file: {file_name}")
             print(f"Rows: {len(df)}")
             print(f"Cut-in vehicles: {df['id'].nunique()}")
 
-            # Group by cut-in vehicle ID
-            initial_states = []
-
-            for vehicle_id in sorted(df['id'].unique()):
-                vehicle_df = df[df['id'] == vehicle_id].sort_values('frame')
-
-                if len(vehicle_df) == 1:
-                    # If only one row, use it as initial state
-                    initial_states.append(vehicle_df.iloc[0])
-                else:
-                    # This trajectory contains a complete cut-in event
-                    # Take the first row as initial state
-                    initial_states.append(vehicle_df.iloc[0])
-
-                    # Debug info: show time range of this cut-in event
-                    start_frame = vehicle_df['frame'].min()
-                    end_frame = vehicle_df['frame'].max()
-                    print(f"Vehicle {vehicle_id}: frame range {start_frame}-{end_frame} ({len(vehicle_df)} frames)")
+            # Each trajectory contains a complete cut-in event
+            # Take the first row of each cut-in vehicle as initial state
+            df = df.sort_values(['id', 'frame'], kind='stable')
+            result_df = df.drop_duplicates('id', keep='first')
 
-            # Create result DataFrame, preserve original column order
-            result_df = pd.DataFrame(initial_states)
-            result_df = result_df[df.columns]
+            # Debug info: show time range of each cut-in event
+            frame_ranges = df.groupby('id')['frame'].agg(['min', 'max', 'size'])
+            frame_ranges = frame_ranges[frame_ranges['size'] > 1]
+            for vehicle_id, start_frame, end_frame, num_frames in frame_ranges.itertuples():
+                print(f"Vehicle {vehicle_id}: frame range {start_frame}-{end_frame} ({num_frames} frames)")
 
             print(f"Extracted {len(result_df)} cut-in vehicle initial states")
             print(f"Involves {result_df['id'].nunique()} unique cut-in vehicles")
@@ -6,6 +6,11 @@ For each detected cut-in event, extract the vehicle's state information at the m
 
 import pandas as pd
 import os
+import sys
+
+# Shared HighD helpers live in highd_io.py at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from highd_io import HIGHD_DTYPES
 
 # 1. Set base data directories
 input_folder = './output/victim_trajectories'             # Directory for saving victim vehicle trajectories
@@ -19,7 +24,7 @@ for file_name in os.listdir(input_folder):
         input_path = os.path.join(input_folder, file_name)
 
         try:
-            df = pd.read_csv(input_path)
+            df = pd.read_csv(input_path, dtype=HIGHD_DTYPES)
             print(f"Processing: {file_name}")
             print(f"Total rows: {len(df)}")
 
@@ -28,53 +33,20 @@ for file_name in os.listdir(input_folder):
                 print(f"Cut-in events: {df['cut_in_event_id'].nunique()}")
 
                 # Group by cut-in event ID, take first row for each event
-                initial_states = []
-
-                for event_id in sorted(df['cut_in_event_id'].unique()):
-                    event_df = df[df['cut_in_event_id'] == event_id].sort_values('frame')
-
-                    if not event_df.empty:
-                        # Take first row of this event
-                        first_row = event_df.iloc[0]
-                        initial_states.append(first_row)
-
-                # Create result DataFrame, preserve original column order
-                result_df = pd.DataFrame(initial_states)
-                result_df = result_df[df.columns]
+                df = df.sort_values(['cut_in_event_id', 'frame'], kind='stable')
+                result_df = df.drop_duplicates('cut_in_event_id', keep='first')
 
             else:
                 print(f"Warning: File missing 'cut_in_event_id' column, grouping by vehicle ID and frame continuity")
 
                 # Group by vehicle ID
-                df = df.sort_values(['id', 'frame'])
-                initial_states = []
-
-                for vehicle_id in df['id'].unique():
-                    vehicle_df = df[df['id'] == vehicle_id]
-
-                    if len(vehicle_df) == 1:
-                        initial_states.append(vehicle_df.iloc[0])
-                    else:
-                        # Find frame discontinuity points (identify separate events based on frame continuity)
-                        frames = vehicle_df['frame'].values
-                        frame_diffs = frames[1:] - frames[:-1]
-
-                        break_points = [0]
-                        for i, diff in enumerate(frame_diffs, 1):
-                            if diff > 1:
-                                break_points.append(i)
-
-                        # Take first row of each continuous segment
-                        for i in range(len(break_points)):
-                            start_idx = break_points[i]
-                            end_idx = break_points[i + 1] if i + 1 < len(break_points) else len(vehicle_df)
-                            segment = vehicle_df.iloc[start_idx:end_idx]
-                            if not segment.empty:
-                                initial_states.append(segment.iloc[0])
-
-                # Create result DataFrame, preserve original column order
-                result_df = pd.DataFrame(initial_states)
-                result_df = result_df[df.columns]
+                df = df.sort_values(['id', 'frame'], kind='stable')
+
+                # Find frame discontinuity points (identify separate events based on frame continuity)
+                segment_start = df['id'].ne(df['id'].shift()) | df['frame'].diff().gt(1)
+
+                # Take first row of each continuous segment
+                result_df = df[segment_start]
 
             print(f"Extracted {len(result_df)} initial states")
             print(f"Involves {result_df['id'].nunique()} unique vehicle IDs")
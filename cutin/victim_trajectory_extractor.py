@@ -6,18 +6,37 @@ being cut in on during cut-in maneuvers.
 """
 
 import pandas as pd
+import numpy as np
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# Shared HighD helpers live in highd_io.py at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from highd_io import HIGHD_DTYPES, load_tracks
 
 # 1. Set base data directories
 base_data_dir = './data/highD-dataset-v1.0'                   # HighD dataset directory
 cutin_data_dir = './output/cutin_trajectories'                # Directory for saving cut-in vehicle trajectories
 # cutin_data_dir = "./output/cutin_trajectories_filtered"     # Directory for speed-filtered results (if speed filtered)
 output_dir = './output/victim_trajectories'                   # Directory for saving victim vehicle trajectories
+cache_dir = './output/tracks_cache'                           # Directory for caching parsed HighD tracks
 
 os.makedirs(output_dir, exist_ok=True)
+os.makedirs(cache_dir, exist_ok=True)
+
+MAX_WORKERS = None    # Worker processes for recordings (None uses all CPU cores)
+
+# Cut-in trajectory columns used for victim detection
+CUT_IN_COLUMNS = ['id', 'frame', 'followingId', 'leftPrecedingId', 'rightPrecedingId']
+
+
+# 2. Process a single recording file
+def process_recording(file_num):
+    """Extract victim vehicle trajectories of a single recording, return number of cut-in events and messages"""
+    # Messages are collected and printed by the main process in recording order
+    log = []
 
-# 2. Process all recording files (01-60)
-for file_num in range(1, 61):
     # Build 2-digit file number
     file_num_str = f"{file_num:02d}"
 
@@ -27,91 +46,83 @@ for file_num in range(1, 61):
     tracks_path = os.path.join(base_data_dir, f'{file_num_str}_tracks.csv')
     save_path = os.path.join(output_dir, f'cutted_in_trajectories_{file_num_str}.csv')
 
-    print(f"\n{'=' * 60}")
-    print(f"Processing recording {file_num_str}...")
-    print(f"Cut-in events file: {cut_in_path}")
-    print(f"Trajectory file: {tracks_path}")
-    print(f"Output file: {save_path}")
-    print(f"{'=' * 60}")
+    log.append(f"\n{'=' * 60}")
+    log.append(f"Processing recording {file_num_str}...")
+    log.append(f"Cut-in events file: {cut_in_path}")
+    log.append(f"Trajectory file: {tracks_path}")
+    log.append(f"Output file: {save_path}")
+    log.append(f"{'=' * 60}")
 
     # Check if files exist
     if not os.path.exists(cut_in_path):
-        print(f"Warning: Cut-in events file not found, skipping")
-        continue
+        log.append(f"Warning: Cut-in events file not found, skipping")
+        return 0, log
     if not os.path.exists(tracks_path):
-        print(f"Warning: Trajectory file not found, skipping")
-        continue
+        log.append(f"Warning: Trajectory file not found, skipping")
+        return 0, log
 
     # 3. Load data
-    print("\nLoading cut-in event data...")
+    log.append("\nLoading cut-in event data...")
     try:
-        cut_in_df = pd.read_csv(cut_in_path)
-        tracks_df = pd.read_csv(tracks_path)
+        cut_in_df = pd.read_csv(cut_in_path, usecols=CUT_IN_COLUMNS, dtype=HIGHD_DTYPES)
+        tracks_df = load_tracks(tracks_path, cache_dir)
     except Exception as e:
-        print(f"Failed to read: {e}")
-        continue
+        log.append(f"Failed to read: {e}")
+        return 0, log
+
+    # 4. Detect each cut-in event
+    # Possible cut-in targets: left and right preceding vehicles of each cut-in vehicle frame
+    possible_targets = pd.concat([
+        cut_in_df[['id', 'frame', 'leftPrecedingId']].rename(columns={'leftPrecedingId': 'victim_vehicle_id'})
+        .assign(cut_in_direction='left'),
+        cut_in_df[['id', 'frame', 'rightPrecedingId']].rename(columns={'rightPrecedingId': 'victim_vehicle_id'})
+        .assign(cut_in_direction='right')
+    ], ignore_index=True)
+    possible_targets = possible_targets[possible_targets['victim_vehicle_id'] > 0]
+
+    # Last frame in which each vehicle is behind the cut-in vehicle
+    last_following = (cut_in_df.groupby(['id', 'followingId'])['frame'].max()
+                      .rename('last_following_frame').reset_index()
+                      .rename(columns={'followingId': 'victim_vehicle_id'}))
+
+    # A target is cut in on if it appears behind the cut-in vehicle in a subsequent frame
+    matches = possible_targets.merge(last_following, on=['id', 'victim_vehicle_id'])
+    matches = matches[matches['last_following_frame'] > matches['frame']]
+
+    # Keep earliest detection per cut-in vehicle, left target first, in order of appearance
+    vehicle_order = {vehicle_id: k for k, vehicle_id in enumerate(cut_in_df['id'].unique())}
+    matches = matches.sort_values(['id', 'frame'], kind='stable').drop_duplicates('id')
+    matches = matches.sort_values('id', key=lambda ids: ids.map(vehicle_order), kind='stable')
+
+    # Determine start and end frames for each cut-in event
+    frame_range = cut_in_df.groupby('id')['frame'].agg(['min', 'max'])
 
     # Store cut-in event list
-    cut_in_events = []
+    cut_in_events = pd.DataFrame({
+        'cut_in_vehicle_id': matches['id'].to_numpy(),
+        'victim_vehicle_id': matches['victim_vehicle_id'].to_numpy(),
+        'start_frame': matches['id'].map(frame_range['min']).to_numpy(),
+        'end_frame': matches['id'].map(frame_range['max']).to_numpy(),
+        'cut_in_detected_frame': matches['frame'].to_numpy(),
+        'cut_in_direction': matches['cut_in_direction'].to_numpy()
+    }).to_dict('records')
 
-    # 4. Group by cut-in vehicle ID and detect each cut-in event
-    cut_in_vehicle_ids = cut_in_df['id'].unique()
+    log.append(f"Found {len(cut_in_events)} cut-in events")
 
-    for cut_in_vehicle_id in cut_in_vehicle_ids:
-        # Get trajectory of this cut-in vehicle
-        cut_in_vehicle_data = cut_in_df[cut_in_df['id'] == cut_in_vehicle_id].sort_values('frame')
+    # 5. Extract victim vehicle trajectories
+    all_trajectories = []
 
-        if len(cut_in_vehicle_data) < 2:
-            continue
+    # Event information of each extracted trajectory, added as columns after merging
+    trajectory_events = []
 
-        # Determine start and end frames for this cut-in event
-        start_frame = cut_in_vehicle_data['frame'].min()
-        end_frame = cut_in_vehicle_data['frame'].max()
-
-        # Search for victim vehicle in the entire trajectory
-        for i in range(len(cut_in_vehicle_data)):
-            current_row = cut_in_vehicle_data.iloc[i]
-
-            # Check left and right preceding vehicles
-            left_target = current_row['leftPrecedingId']
-            right_target = current_row['rightPrecedingId']
-
-            # Store possible cut-in targets
-            possible_targets = []
-            if left_target > 0:
-                possible_targets.append(('left', left_target))
-            if right_target > 0:
-                possible_targets.append(('right', right_target))
-
-            # Check each possible target
-            for position, victim_id in possible_targets:
-                # Check if this vehicle appears behind ego vehicle in subsequent frames
-                found_cut_in = False
-
-                for j in range(i + 1, len(cut_in_vehicle_data)):
-                    if cut_in_vehicle_data.iloc[j]['followingId'] == victim_id:
-                        cut_in_events.append({
-                            'cut_in_vehicle_id': cut_in_vehicle_id,
-                            'victim_vehicle_id': victim_id,
-                            'start_frame': start_frame,
-                            'end_frame': end_frame,
-                            'cut_in_detected_frame': current_row['frame'],
-                            'cut_in_direction': position
-                        })
-                        found_cut_in = True
-                        break
-
-                if found_cut_in:
-                    break
-
-            # If cut-in event found, break out of loop
-            if possible_targets and found_cut_in:
-                break
-
-    print(f"Found {len(cut_in_events)} cut-in events")
+    # Event log lines, printed once per recording
+    event_log = []
 
-    # 5. Extract victim vehicle trajectories
-    all_trajectories = []
+    # Index trajectories of victim vehicles once, each sorted by frame
+    tracks_df = tracks_df[tracks_df['id'].isin([event['victim_vehicle_id'] for event in cut_in_events])]
+    tracks_df = tracks_df.sort_values(['id', 'frame'], kind='stable')
+    id_to_block = dict(iter(tracks_df.groupby('id', sort=False)))
+    id_to_frames = {vehicle_id: block['frame'].to_numpy() for vehicle_id, block in id_to_block.items()}
 
     for event_idx, event in enumerate(cut_in_events):
         victim_id = event['victim_vehicle_id']
@@ -121,63 +132,81 @@ for file_num in range(1, 61):
         cut_in_detected_frame = event['cut_in_detected_frame']
 
         # Extract complete trajectory of victim vehicle
-        target_traj = tracks_df[tracks_df['id'] == victim_id].copy()
-
-        if len(target_traj) == 0:
-            print(f"Event {event_idx + 1}: Victim vehicle {victim_id} trajectory not found")
+        if victim_id not in id_to_block:
+            log.append(f"Event {event_idx + 1}: Victim vehicle {victim_id} trajectory not found")
             continue
 
         # Extract trajectory segment within cut-in event time range
-        target_traj_segment = target_traj[
-            (target_traj['frame'] >= start_frame) &
-            (target_traj['frame'] <= end_frame)
-            ].copy()
+        frames = id_to_frames[victim_id]
+        lo = np.searchsorted(frames, start_frame, side='left')
+        hi = np.searchsorted(frames, end_frame, side='right')
+        target_traj_segment = id_to_block[victim_id].iloc[lo:hi]
 
         if len(target_traj_segment) == 0:
-            print(f"Event {event_idx + 1}: Victim vehicle {victim_id} has no data in frame range {start_frame}-{end_frame}")
+            log.append(f"Event {event_idx + 1}: Victim vehicle {victim_id} has no data in frame range {start_frame}-{end_frame}")
             continue
 
-        target_traj_segment['is_cut_in_target'] = True
-        target_traj_segment['cut_in_event_id'] = event_idx + 1
-        target_traj_segment['cut_in_start_frame'] = start_frame
-        target_traj_segment['cut_in_end_frame'] = end_frame
-        target_traj_segment['cut_in_detected_frame'] = cut_in_detected_frame
-        target_traj_segment['cut_in_vehicle_id'] = cut_in_id
-        target_traj_segment['victim_vehicle_id'] = victim_id
-        target_traj_segment['recording_id'] = file_num_str
-
         all_trajectories.append(target_traj_segment)
-        print(f"   事件{event_idx + 1}: 车辆 {victim_id} 被 {cut_in_id} 切入")
-        print(f"       时间范围: 帧{start_frame}到{end_frame} ({len(target_traj_segment)}帧)")
-        print(f"       切入检测帧: {cut_in_detected_frame}")
+        trajectory_events.append((event_idx + 1, start_frame, end_frame, cut_in_detected_frame, cut_in_id, victim_id))
+        event_log.append(f"   事件{event_idx + 1}: 车辆 {victim_id} 被 {cut_in_id} 切入\n"
+                         f"       时间范围: 帧{start_frame}到{end_frame} ({len(target_traj_segment)}帧)\n"
+                         f"       切入检测帧: {cut_in_detected_frame}")
+
+    if event_log:
+        log.append('\n'.join(event_log))
 
     # 6. Merge and save results for current recording
     if all_trajectories:
         result_df = pd.concat(all_trajectories, ignore_index=True)
 
+        # Add event information to the rows of each trajectory
+        segment_lengths = [len(segment) for segment in all_trajectories]
+        event_columns = ['cut_in_event_id', 'cut_in_start_frame', 'cut_in_end_frame',
+                         'cut_in_detected_frame', 'cut_in_vehicle_id', 'victim_vehicle_id']
+        event_values = pd.DataFrame(trajectory_events, columns=event_columns).to_numpy()
+        result_df['is_cut_in_target'] = True
+        for column, values in zip(event_columns, event_values.T):
+            result_df[column] = np.repeat(values, segment_lengths)
+        result_df['recording_id'] = file_num_str
+
         # Add cut-in event ID to each segment
         result_df = result_df.sort_values(['cut_in_event_id', 'frame'])
 
         result_df.to_csv(save_path, index=False)
-        print(f"\nSave completed! Total {len(result_df)} rows, {len(all_trajectories)} cut-in event trajectories")
-        print(f"File saved to: {save_path}")
+        log.append(f"\nSave completed! Total {len(result_df)} rows, {len(all_trajectories)} cut-in event trajectories")
+        log.append(f"File saved to: {save_path}")
 
         # Output statistics
-        print(f"\nStatistics:")
-        print(f"- Total cut-in events: {len(cut_in_events)}")
-        print(f"- Unique victim vehicles: {result_df['victim_vehicle_id'].nunique()}")
+        log.append(f"\nStatistics:")
+        log.append(f"- Total cut-in events: {len(cut_in_events)}")
+        log.append(f"- Unique victim vehicles: {result_df['victim_vehicle_id'].nunique()}")
 
         # Check if any victim vehicle was cut in multiple times
         victim_counts = result_df.groupby('victim_vehicle_id')['cut_in_event_id'].nunique()
         multi_cut_victims = victim_counts[victim_counts > 1]
         if len(multi_cut_victims) > 0:
-            print(f"- Vehicles cut in multiple times: {len(multi_cut_victims)}")
+            log.append(f"- Vehicles cut in multiple times: {len(multi_cut_victims)}")
             for victim_id, count in multi_cut_victims.items():
-                print(f"Vehicle {victim_id}: {count} cut-ins")
+                log.append(f"Vehicle {victim_id}: {count} cut-ins")
     else:
-        print("No cut-in events found")
+        log.append("No cut-in events found")
+
+    return len(all_trajectories), log
+
+
+def main():
+    """Process all recording files (01-60) in parallel"""
+    event_counts = []
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for event_count, log in executor.map(process_recording, range(1, 61), chunksize=2):
+            print('\n'.join(log))
+            event_counts.append(event_count)
+
+    print(f"\n{'=' * 60}")
+    print(f"All recordings processed, {sum(event_counts)} cut-in event trajectories")
+    print(f"Results saved in: {output_dir}")
+    print(f"{'=' * 60}")
+
 
-print(f"\n{'=' * 60}")
-print(f"All recordings processed")
-print(f"Results saved in: {output_dir}")
-print(f"{'=' * 60}")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,59 @@
+"""
+Shared HighD input helpers.
+
+Column dtypes used when reading HighD tracks, tracksMeta and the trajectory
+files derived from them, and a cached loader for HighD tracks, imported by
+the cut-in and lane-change scripts.
+"""
+
+import pandas as pd
+import os
+import hashlib
+
+# Integer columns of HighD data: ids and frames fit in int32, lane ids and counts in int8
+HIGHD_INT_DTYPES = {
+    'id': 'int32', 'frame': 'int32', 'laneId': 'int8',
+    'precedingId': 'int32', 'followingId': 'int32',
+    'leftPrecedingId': 'int32', 'leftAlongsideId': 'int32', 'leftFollowingId': 'int32',
+    'rightPrecedingId': 'int32', 'rightAlongsideId': 'int32', 'rightFollowingId': 'int32',
+    'numLaneChanges': 'int8', 'drivingDirection': 'int8'
+}
+
+# Column dtypes of HighD data: the integer columns above, positions, velocities and
+# distances (two decimals) in float32, vehicle class is one of a few fixed labels
+HIGHD_DTYPES = {
+    **HIGHD_INT_DTYPES,
+    'x': 'float32', 'y': 'float32', 'width': 'float32', 'height': 'float32',
+    'xVelocity': 'float32', 'yVelocity': 'float32', 'xAcceleration': 'float32', 'yAcceleration': 'float32',
+    'frontSightDistance': 'float32', 'backSightDistance': 'float32',
+    'dhw': 'float32', 'thw': 'float32', 'ttc': 'float32', 'precedingXVelocity': 'float32',
+    'class': pd.CategoricalDtype(['Car', 'Truck'])
+}
+
+# Tag of the dtype map, part of the cache file names so that tracks cached with other dtypes are not reused
+DTYPES_TAG = hashlib.md5(repr(sorted((column, repr(dtype)) for column, dtype in HIGHD_DTYPES.items()))
+                         .encode()).hexdigest()[:8]
+
+
+# Helper function: Load HighD tracks, caching the parsed data on first run
+def load_tracks(tracks_path, cache_dir):
+    """Read a HighD tracks CSV with HIGHD_DTYPES, reusing the pickled copy in cache_dir when it is current"""
+    cache_name = os.path.basename(tracks_path).replace('.csv', f'.{DTYPES_TAG}.pkl')
+    cache_path = os.path.join(cache_dir, cache_name)
+
+    # Reuse cache unless the CSV file has changed since it was written
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(tracks_path):
+        return pd.read_pickle(cache_path)
+
+    tracks = pd.read_csv(tracks_path, dtype=HIGHD_DTYPES)
+
+    # Write to a temporary file and move it into place, so that concurrent or
+    # interrupted runs never leave a partially written cache behind
+    temp_path = f'{cache_path}.{os.getpid()}.tmp'
+    try:
+        tracks.to_pickle(temp_path)
+        os.replace(temp_path, cache_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return tracks
\ No newline at end of file
@@ -5,6 +5,7 @@ Extract and format the initial vehicle state from the lane change scene to match
 import pandas as pd
 import numpy as np
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 # 1. Set base data directories
 base_input_dir = './output/surround_data/surround_data_initial'
@@ -14,14 +15,21 @@ meta_base_dir = './data/highD-dataset-v1.0'
 
 os.makedirs(intermediate_output_dir, exist_ok=True)
 
+MAX_WORKERS = None    # Worker processes for scenes (None uses all CPU cores)
+
+# State columns needed for alignment
+STATE_COLUMNS = ['frame', 'id', 'x', 'y', 'xVelocity', 'laneId', 'driving_direction']
+
 
 # 2.Process Each Scene Data
 def process_single_scene(scene_num):
     scene_str = f"{scene_num:02d}"
 
-    print(f"\n{'=' * 60}")
-    print(f"Processing scene {scene_str}")
-    print(f"{'=' * 60}")
+    # Messages are collected and printed by the main process in scene order
+    log = []
+    log.append(f"\n{'=' * 60}")
+    log.append(f"Processing scene {scene_str}")
+    log.append(f"{'=' * 60}")
 
     # Construct file paths
     base_path = os.path.join(base_input_dir, 'merging_vehicle_data',
@@ -44,8 +52,8 @@ def process_single_scene(scene_num):
             missing_files.append(os.path.basename(file_path))
 
     if missing_files:
-        print(f"Missing files: {missing_files}")
-        return None, f"Scene {scene_str}: Files missing"
+        log.append(f"Missing files: {missing_files}")
+        return None, f"Scene {scene_str}: Files missing", log
 
     try:
         df_base = pd.read_csv(base_path)
@@ -53,134 +61,74 @@ def process_single_scene(scene_num):
         df_adj_preceding = pd.read_csv(adj_preceding_path)
         df_original_preceding = pd.read_csv(original_preceding_path)
 
-        print(f"Read successfully: base vehicle ({len(df_base)} rows), "
-              f"following vehicle ({len(df_adj_following)} rows), "
-              f"adjacent preceding vehicle ({len(df_adj_preceding)} rows), "
-              f"original preceding vehicle ({len(df_original_preceding)} rows)")
-
-        # Find common frames
-        common_frames = set(df_base['frame']).intersection(
-            set(df_adj_following['frame']),
-            set(df_adj_preceding['frame']),
-            set(df_original_preceding['frame'])
-        )
-
-        if len(common_frames) == 0:
-            print("Warning: No common frames")
-            return None, f"Scene {scene_str}: No common frames"
-
-        print(f"Common frames count: {len(common_frames)}")
-
-        # Extract data for common frames
-        df_base_common = df_base[df_base['frame'].isin(common_frames)].sort_values('frame').reset_index(drop=True)
-        df_adj_following_common = df_adj_following[df_adj_following['frame'].isin(common_frames)].sort_values(
-            'frame').reset_index(drop=True)
-        df_adj_preceding_common = df_adj_preceding[df_adj_preceding['frame'].isin(common_frames)].sort_values(
-            'frame').reset_index(drop=True)
-        df_original_preceding_common = df_original_preceding[
-            df_original_preceding['frame'].isin(common_frames)].sort_values('frame').reset_index(drop=True)
-
-        # Determine minimum length
-        min_length = min(len(df_base_common), len(df_adj_following_common),
-                         len(df_adj_preceding_common), len(df_original_preceding_common))
-
-        print(f"Aligned data rows: {min_length}")
-
-        # Process each row of data
-        combined_data = []
-
-        for idx in range(min_length):
-            row_base = df_base_common.iloc[idx]
-            row_following = df_adj_following_common.iloc[idx]
-            row_preceding = df_adj_preceding_common.iloc[idx]
-            row_original = df_original_preceding_common.iloc[idx]
-
-            # Calculate relative information
-            x_base = row_base['x']
-            y_base = row_base['y']
-
-            # Relative information for adjacent following vehicle
-            x_rel_following = row_following['x'] - x_base
-            y_rel_following = row_following['y'] - y_base
-            distance_following = np.sqrt(x_rel_following ** 2 + y_rel_following ** 2)
-
-            # Relative information for adjacent preceding vehicle
-            x_rel_preceding = row_preceding['x'] - x_base
-            y_rel_preceding = row_preceding['y'] - y_base
-            distance_preceding = np.sqrt(x_rel_preceding ** 2 + y_rel_preceding ** 2)
-
-            # Relative information for original preceding vehicle
-            x_rel_original = row_original['x'] - x_base
-            y_rel_original = row_original['y'] - y_base
-            distance_original = np.sqrt(x_rel_original ** 2 + y_rel_original ** 2)
-
-            # Get driving direction of base vehicle
-            base_direction = row_base['driving_direction']
-
-            # Verify other vehicles have same direction as base vehicle
-            if row_following['driving_direction'] != base_direction:
-                print(f"Warning: Following vehicle direction mismatch - base:{base_direction}, following:{row_following['driving_direction']}")
-            if row_preceding['driving_direction'] != base_direction:
-                print(f"Warning: Adjacent preceding vehicle direction mismatch - base:{base_direction}, preceding:{row_preceding['driving_direction']}")
-            if row_original['driving_direction'] != base_direction:
-                print(f"Warning: Original preceding vehicle direction mismatch - base:{base_direction}, original:{row_original['driving_direction']}")
-
-            # Calculate adjusted lane difference
-            if base_direction == 2:
-                # Direction 2: Keep original
-                adjusted_following_laneId_diff = row_following['laneId'] - row_base['laneId']
-                adjusted_preceding_laneId_diff = row_preceding['laneId'] - row_base['laneId']
-                adjusted_original_laneId_diff = row_original['laneId'] - row_base['laneId']
-            else:
-                # Direction 1: Take opposite sign
-                adjusted_following_laneId_diff = -(row_following['laneId'] - row_base['laneId'])
-                adjusted_preceding_laneId_diff = -(row_preceding['laneId'] - row_base['laneId'])
-                adjusted_original_laneId_diff = -(row_original['laneId'] - row_base['laneId'])
-
-            combined_row = {
-                'scene': scene_str,
-                'frame': row_base['frame'],
-
-                # Base vehicle
-                'base_id': row_base['id'],
-                'base_x': x_base,
-                'base_y': y_base,
-                'base_xVelocity': row_base['xVelocity'],
-                'base_laneId': row_base['laneId'],
-                'base_driving_direction': base_direction,
-
-                # Adjacent following vehicle
-                'following_id': row_following['id'],
-                'following_x_rel': x_rel_following,
-                'following_y_rel': y_rel_following,
-                'following_distance': distance_following,
-                'following_xVelocity': row_following['xVelocity'],
-                'following_laneId_diff': row_following['laneId'] - row_base['laneId'],
-                'following_adjusted_laneId_diff': adjusted_following_laneId_diff,
-                'following_driving_direction': row_following['driving_direction'],
-
-                # Adjacent preceding vehicle
-                'preceding_id': row_preceding['id'],
-                'preceding_x_rel': x_rel_preceding,
-                'preceding_y_rel': y_rel_preceding,
-                'preceding_distance': distance_preceding,
-                'preceding_xVelocity': row_preceding['xVelocity'],
-                'preceding_laneId_diff': row_preceding['laneId'] - row_base['laneId'],
-                'preceding_adjusted_laneId_diff': adjusted_preceding_laneId_diff,
-                'preceding_driving_direction': row_preceding['driving_direction'],
-
-                # Original preceding vehicle
-                'original_id': row_original['id'],
-                'original_x_rel': x_rel_original,
-                'original_y_rel': y_rel_original,
-                'original_distance': distance_original,
-                'original_xVelocity': row_original['xVelocity'],
-                'original_laneId_diff': row_original['laneId'] - row_base['laneId'],
-                'original_adjusted_laneId_diff': adjusted_original_laneId_diff,
-                'original_driving_direction': row_original['driving_direction'],
-            }
-
-            combined_data.append(combined_row)
+        log.append(f"Read successfully: base vehicle ({len(df_base)} rows), "
+                   f"following vehicle ({len(df_adj_following)} rows), "
+                   f"adjacent preceding vehicle ({len(df_adj_preceding)} rows), "
+                   f"original preceding vehicle ({len(df_original_preceding)} rows)")
+
+        # Align vehicles on common frames; rows sharing a frame are paired in order of appearance
+        aligned = None
+        for suffix, df in (('', df_base), ('_following', df_adj_following),
+                           ('_preceding', df_adj_preceding), ('_original', df_original_preceding)):
+            df = df[STATE_COLUMNS].sort_values('frame', kind='stable')
+            df['frame_rank'] = df.groupby('frame').cumcount()
+            df = df.rename(columns={c: c + suffix for c in STATE_COLUMNS if c != 'frame'})
+            aligned = df if aligned is None else aligned.merge(df, on=['frame', 'frame_rank'], validate='one_to_one')
+
+        if aligned.empty:
+            log.append("Warning: No common frames")
+            return None, f"Scene {scene_str}: No common frames", log
+
+        log.append(f"Common frames count: {aligned['frame'].nunique()}")
+        log.append(f"Aligned data rows: {len(aligned)}")
+
+        # Base vehicle position
+        x_base = aligned['x'].to_numpy()
+        y_base = aligned['y'].to_numpy()
+        lane_base = aligned['laneId'].to_numpy()
+
+        # Get driving direction of base vehicle
+        base_direction = aligned['driving_direction'].to_numpy()
+
+        # Verify other vehicles have same direction as base vehicle
+        for name, label in (('Following vehicle', 'following'), ('Adjacent preceding vehicle', 'preceding'),
+                            ('Original preceding vehicle', 'original')):
+            mismatch = aligned[f'driving_direction_{label}'].to_numpy() != base_direction
+            if mismatch.any():
+                log.append(f"Warning: {name} direction mismatch in {mismatch.sum()} frames")
+
+        # Lane difference sign: direction 2 keeps original, direction 1 takes opposite sign
+        lane_sign = np.where(base_direction == 2, 1, -1)
+
+        combined_data = {
+            'scene': scene_str,
+            'frame': aligned['frame'].to_numpy(),
+
+            # Base vehicle
+            'base_id': aligned['id'].to_numpy(),
+            'base_x': x_base,
+            'base_y': y_base,
+            'base_xVelocity': aligned['xVelocity'].to_numpy(),
+            'base_laneId': lane_base,
+            'base_driving_direction': base_direction,
+        }
+
+        # Relative information for adjacent following, adjacent preceding and original preceding vehicles
+        for prefix in ('following', 'preceding', 'original'):
+            x_rel = aligned[f'x_{prefix}'].to_numpy() - x_base
+            y_rel = aligned[f'y_{prefix}'].to_numpy() - y_base
+            lane_diff = aligned[f'laneId_{prefix}'].to_numpy() - lane_base
+
+            combined_data.update({
+                f'{prefix}_id': aligned[f'id_{prefix}'].to_numpy(),
+                f'{prefix}_x_rel': x_rel,
+                f'{prefix}_y_rel': y_rel,
+                f'{prefix}_distance': np.sqrt(x_rel ** 2 + y_rel ** 2),
+                f'{prefix}_xVelocity': aligned[f'xVelocity_{prefix}'].to_numpy(),
+                f'{prefix}_laneId_diff': lane_diff,
+                f'{prefix}_adjusted_laneId_diff': lane_sign * lane_diff,
+                f'{prefix}_driving_direction': aligned[f'driving_direction_{prefix}'].to_numpy(),
+            })
 
         # Create DataFrame and save
         combined_df = pd.DataFrame(combined_data)
@@ -201,68 +149,48 @@ def process_single_scene(scene_num):
             ]) if len(combined_df) > 0 else 'N/A'
         }
 
-        print(f"Completed! Saved to: {os.path.basename(output_path)}")
-        print(f"Data rows: {len(combined_df)}")
-        print(f"Base vehicle direction: {stats['base_direction']}")
-        print(f"Direction consistency check: {stats['direction_consistency_check']}")
+        log.append(f"Completed! Saved to: {os.path.basename(output_path)}")
+        log.append(f"Data rows: {len(combined_df)}")
+        log.append(f"Base vehicle direction: {stats['base_direction']}")
+        log.append(f"Direction consistency check: {stats['direction_consistency_check']}")
 
-        return combined_df, stats
+        return combined_df, stats, log
 
     except Exception as e:
-        print(f"Processing failed: {e}")
-        return None, f"Scene {scene_str}: {str(e)}"
+        log.append(f"Processing failed: {e}")
+        return None, f"Scene {scene_str}: {str(e)}", log
 
 # 3. Merge All Scene Data
-def merge_all_scenes():
-    """Merge intermediate files from all scenes"""
+def merge_all_scenes(scene_results):
+    """Merge combined data of all processed scenes"""
     print("\n" + "=" * 60)
-    print("Starting to merge all scene files...")
+    print("Starting to merge all scene data...")
     print("=" * 60)
 
-    # Get all scene files
-    all_files = os.listdir(intermediate_output_dir)
-    scene_files = [f for f in all_files if f.startswith('scene') and f.endswith('_vehicles_initial_state_combined.csv')]
-
-    if not scene_files:
-        scene_files = [f for f in all_files if f.startswith('scene') and f.endswith('_combined.csv')]
-
-    print(f"Found {len(scene_files)} scene files")
+    print(f"Found {len(scene_results)} processed scenes")
 
-    # Read and merge
+    # Collect scene data
     all_data = []
     scene_stats = []
 
-    for filename in sorted(scene_files):
-        file_path = os.path.join(intermediate_output_dir, filename)
+    for scene_num, df in scene_results:
+        filename = f"scene{scene_num}_vehicles_initial_state_combined.csv"
 
-        try:
-            df = pd.read_csv(file_path)
+        # Add filename; the scene number is written as a plain integer, as when read back from the scene file
+        df = df.assign(scene=int(scene_num), source_file=filename)
+        all_data.append(df)
 
-            # Extract scene number
-            scene_num = filename.split('_')[0].replace('scene', '')
-
-            # Ensure scene column exists
-            if 'scene' not in df.columns:
-                df['scene'] = scene_num
-
-            # Add filename
-            df['source_file'] = filename
-            all_data.append(df)
-
-            # Collect statistics
-            stats = {
-                'scene': scene_num,
-                'filename': filename,
-                'rows': len(df),
-                'frames': df['frame'].nunique() if 'frame' in df.columns else 0,
-                'base_id': df['base_id'].iloc[0] if 'base_id' in df.columns and len(df) > 0 else 'N/A'
-            }
-            scene_stats.append(stats)
-
-            print(f"Read: {filename} ({len(df)} rows)")
+        # Collect statistics
+        stats = {
+            'scene': scene_num,
+            'filename': filename,
+            'rows': len(df),
+            'frames': df['frame'].nunique() if 'frame' in df.columns else 0,
+            'base_id': df['base_id'].iloc[0] if 'base_id' in df.columns and len(df) > 0 else 'N/A'
+        }
+        scene_stats.append(stats)
 
-        except Exception as e:
-            print(f"Failed to read file {filename}: {e}")
+        print(f"Collected: {filename} ({len(df)} rows)")
 
     # Merge all data
     if all_data:
@@ -295,7 +223,7 @@ def merge_all_scenes():
 
         return merged_df
     else:
-        print("No scene files found!")
+        print("No scene data to merge!")
         return None
 
 
@@ -309,17 +237,22 @@ def main():
     successful_scenes = []
     failed_scenes = []
     all_stats = []
+    scene_results = []
 
     # Process all scenes
     print(f"\nStarting batch processing of 60 scenes...")
     print(f"Intermediate output directory: {intermediate_output_dir}")
 
-    for scene_num in range(1, 61):
-        result, stats_or_error = process_single_scene(scene_num)
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        results = list(executor.map(process_single_scene, range(1, 61), chunksize=2))
+
+    for scene_num, (result, stats_or_error, log) in enumerate(results, 1):
+        print('\n'.join(log))
 
         if result is not None:
             successful_scenes.append(f"{scene_num:02d}")
             all_stats.append(stats_or_error)
+            scene_results.append((f"{scene_num:02d}", result))
         else:
             failed_scenes.append(stats_or_error)
 
@@ -336,7 +269,7 @@ def main():
     print(f"\n{'=' * 60}")
     print(f"Final output file: {final_output_file}")
 
-    merged_result = merge_all_scenes()
+    merged_result = merge_all_scenes(scene_results)
 
     print(f"\n{'=' * 80}")
     print("Processing completed!")
@@ -349,4 +282,5 @@ def main():
 
     print("=" * 80)
 
-main()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
\ No newline at end of file
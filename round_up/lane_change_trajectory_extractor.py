@@ -7,330 +7,378 @@ transformation of the three surrounding vehicles (from adjacent lane to current
 """
 
 import pandas as pd
+import numpy as np
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+# Shared HighD helpers live in highd_io.py at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from highd_io import HIGHD_DTYPES
 
 # Parameter Settings
 PRE_FRAMES = 50    # Number of frames before lane change starts
 POST_FRAMES = 50   # Number of frames after lane change is completed
-
-
-# Helper function: Check if ID is valid (non-zero and non-NaN)
-def is_valid_id(id_value):
-    return pd.notna(id_value) and int(id_value) > 0
-
-
-# Helper function: Check if a vehicle has complete trajectory within specified frame range
-def has_trajectory_in_range(tracks_df, vehicle_id, start_frame, end_frame):
-    vehicle_traj = tracks_df[(tracks_df['id'] == vehicle_id) &
-                             (tracks_df['frame'] >= start_frame) &
-                             (tracks_df['frame'] <= end_frame)]
-
-    # Get actual number of existing frames
-    actual_frames = len(vehicle_traj)
+MAX_WORKERS = None # Worker processes for recordings (None uses all CPU cores)
+VERBOSE = False    # Print diagnostics for every lane change candidate
+
+# Column dtypes of the scene information file
+INFO_DTYPES = {
+    'scene_id': 'int32', 'vehicle_id': 'int32', 'driving_direction': 'int8',
+    'round_up_frame': 'int32', 'change_complete_frame': 'int32', 'old_lane': 'int8', 'new_lane': 'int8',
+    'start_frame': 'int32', 'end_frame': 'int32',
+    'adj_preceding_id': 'int32', 'adj_following_id': 'int32', 'original_preceding_id': 'int32',
+    'num_frames': 'int32', 'pre_frames': 'int32', 'post_frames': 'int32'
+}
+
+# Tracks columns scanned for lane changes and surrounding vehicle IDs
+SCAN_COLUMNS = ['laneId', 'precedingId', 'followingId',
+                'leftPrecedingId', 'leftFollowingId', 'rightPrecedingId', 'rightFollowingId']
+
+# Metadata columns used for target vehicle selection
+META_COLUMNS = ['id', 'class', 'numLaneChanges', 'drivingDirection']
+
+# Scene information attached to every trajectory row, as (trajectory column, scene information key)
+SEGMENT_INFO_COLUMNS = [
+    ('round_up_id', 'scene_id'), ('round_up_frame', 'round_up_frame'),
+    ('change_complete_frame', 'change_complete_frame'), ('round_up_direction', 'direction'),
+    ('driving_direction', 'driving_direction'), ('old_lane', 'old_lane'), ('new_lane', 'new_lane'),
+    ('adj_preceding_id', 'adj_preceding_id'), ('adj_following_id', 'adj_following_id'),
+    ('original_preceding_id', 'original_preceding_id')
+]
+
+
+# Helper function: Find the first vehicle without complete trajectory within specified frame range
+def find_incomplete_trajectory(id_to_frames, vehicle_ids, start_frame, end_frame):
+    """Return the first of vehicle_ids lacking a frame in start_frame-end_frame, or None if all are complete"""
     expected_frames = end_frame - start_frame + 1
+    for vehicle_id in vehicle_ids:
+        vehicle_frames = id_to_frames.get(vehicle_id)
+        if vehicle_frames is None:
+            return vehicle_id
+
+        # Frames of a vehicle are sorted: count frames in range by binary search
+        actual_frames = (np.searchsorted(vehicle_frames, end_frame, side='right') -
+                         np.searchsorted(vehicle_frames, start_frame, side='left'))
 
-    # Require 100% completeness
-    return actual_frames == expected_frames
+        # Require 100% completeness
+        if actual_frames != expected_frames:
+            return vehicle_id
+    return None
 
 def process_file(tracksMeta_path, tracks_path, save_dir, file_id):
-    """Process single file, preserving original output format"""
+    """Process single file, preserving original output format; return number of scenes and messages"""
 
     # Build save paths
     save_path = os.path.join(save_dir, f'round_up_trajectories_{file_id:02d}.csv')
     info_path = os.path.join(save_dir, f'round_up_info_{file_id:02d}.csv')
 
     # Read data
-    meta = pd.read_csv(tracksMeta_path)
-    tracks = pd.read_csv(tracks_path)
+    meta = pd.read_csv(tracksMeta_path, usecols=META_COLUMNS, dtype=HIGHD_DTYPES)
+    tracks = pd.read_csv(tracks_path, dtype=HIGHD_DTYPES)
+
+    # Index the rows of each vehicle once, sorted by frame: every vehicle is a contiguous slice of tracks
+    tracks = tracks.sort_values(['id', 'frame'], kind='stable').reset_index(drop=True)
+    track_ids = tracks['id'].to_numpy()
+    track_frames = tracks['frame'].to_numpy()
+    vehicle_ids, starts = np.unique(track_ids, return_index=True)
+    ends = np.append(starts[1:], len(track_ids))
+    id_to_rows = {vehicle_id: slice(start, end)
+                  for vehicle_id, start, end in zip(vehicle_ids.tolist(), starts.tolist(), ends.tolist())}
+    id_to_frames = {vehicle_id: track_frames[rows] for vehicle_id, rows in id_to_rows.items()}
+
+    # Column arrays of the whole recording, sliced per vehicle without copying
+    track_columns = {column: tracks[column].to_numpy() for column in SCAN_COLUMNS}
 
     # Filter target vehicles from meta: Car class with lane changes, and get driving direction
-    driving_direction_dict = {}
-    for _, row in meta.iterrows():
-        if row['class'] == 'Car' and row['numLaneChanges'] != 0:
-            driving_direction_dict[row['id']] = row['drivingDirection']
+    target_mask = (meta['class'] == 'Car').to_numpy() & (meta['numLaneChanges'].to_numpy() != 0)
+    driving_direction_dict = dict(zip(meta['id'].to_numpy()[target_mask].tolist(),
+                                      meta['drivingDirection'].to_numpy()[target_mask].tolist()))
 
     target_ids = list(driving_direction_dict.keys())
 
-    round_up_data = []
+    round_up_rows = []    # Rows of each extracted trajectory segment in tracks
     round_up_info = []
 
-    print(f"\nStart processing file {file_id:02d}")
-    print(f"Found {len(target_ids)} vehicles that may have performed lane changes")
+    # Messages are collected and printed by the main process in file order,
+    # per-candidate diagnostics only when VERBOSE is set
+    log = []
+
+    log.append(f"\nStart processing file {file_id:02d}")
+    log.append(f"Found {len(target_ids)} vehicles that may have performed lane changes")
 
     # Check each vehicle for lane change behavior and extract precise trajectory segment
     for vid in target_ids:
-        df = tracks[tracks['id'] == vid].sort_values('frame')
+        vehicle = id_to_rows.get(vid)
 
-        if len(df) == 0:
+        if vehicle is None:
             continue
 
-        df = df.reset_index(drop=True)
+        # Column arrays of this vehicle
+        columns = {column: values[vehicle] for column, values in track_columns.items()}
+        frames = id_to_frames[vid]
+        lane_ids = columns['laneId']
+        preceding_arr = columns['precedingId']
+        following_arr = columns['followingId']
+        left_preceding_arr = columns['leftPrecedingId']
+        right_preceding_arr = columns['rightPrecedingId']
+
+        # Frames with valid (non-zero) current lane preceding and following vehicles
+        surrounded = (preceding_arr > 0) & (following_arr > 0)
 
         # Get vehicle's driving direction from dictionary
         driving_direction = driving_direction_dict.get(vid, 1)
 
-        # Find all lane change events
-        for i in range(1, len(df)):
-            current_row = df.iloc[i]
-            prev_row = df.iloc[i - 1]
-
-            # Detect lane change: laneId changes
-            if current_row['laneId'] != prev_row['laneId']:
-                round_up_frame = current_row['frame']
-
-                # Determine lane change direction
-                new_lane = current_row['laneId']
-                old_lane = prev_row['laneId']
-
-                if driving_direction == 1:
-                    if new_lane > old_lane:
-                        direction = 'left'
-                        preceding_id_field = 'leftPrecedingId'
-                        following_id_field = 'leftFollowingId'
-                    else:
-                        direction = 'right'
-                        preceding_id_field = 'rightPrecedingId'
-                        following_id_field = 'rightFollowingId'
+        # Find all lane change events: rows whose laneId differs from the previous row
+        change_idx = np.flatnonzero(lane_ids[1:] != lane_ids[:-1]) + 1
+
+        for i in change_idx:
+            # Lane change detected between rows i-1 and i
+            round_up_frame = frames[i]
+
+            # Determine lane change direction
+            new_lane = lane_ids[i]
+            old_lane = lane_ids[i - 1]
+
+            if driving_direction == 1:
+                if new_lane > old_lane:
+                    direction = 'left'
+                    preceding_id_field = 'leftPrecedingId'
+                    following_id_field = 'leftFollowingId'
+                else:
+                    direction = 'right'
+                    preceding_id_field = 'rightPrecedingId'
+                    following_id_field = 'rightFollowingId'
+            else:
+                if new_lane > old_lane:
+                    direction = 'right'
+                    preceding_id_field = 'rightPrecedingId'
+                    following_id_field = 'rightFollowingId'
+                else:
+                    direction = 'left'
+                    preceding_id_field = 'leftPrecedingId'
+                    following_id_field = 'leftFollowingId'
+
+            if VERBOSE:
+                log.append(f"\nVehicle {vid}: driving direction{driving_direction}, "
+                           f"lane {old_lane}->{new_lane}, determined as {direction} lane change")
+
+            # Check conditions in the frame before lane change
+            # Requirement: Current lane preceding vehicle, adjacent lane preceding vehicle,
+            # and adjacent lane following vehicle must all exist
+            original_preceding_id = int(preceding_arr[i - 1])
+            adj_preceding_id = int(columns[preceding_id_field][i - 1])
+            adj_following_id = int(columns[following_id_field][i - 1])
+
+            if not (original_preceding_id > 0 and adj_preceding_id > 0 and adj_following_id > 0):
+                if VERBOSE:
+                    log.append(f"Does not meet pre-lane-change conditions: has ID 0")
+                continue
+
+            if VERBOSE:
+                log.append(f"Before lane change: current lane preceding={original_preceding_id}, "
+                           f"{preceding_id_field}={adj_preceding_id}, "
+                           f"{following_id_field}={adj_following_id}")
+
+            # Find lane change completion frame (adjacent lane vehicles become current lane vehicles)
+            change_complete_frame = None
+            new_adj_preceding_field = None
+
+            # Check up to 50 frames after lane change, only frames with valid
+            # current lane preceding and following vehicles count
+            window = slice(i, i + 50)
+            valid = surrounded[window]
+
+            # adj_preceding_id becomes precedingId, adj_following_id becomes followingId
+            new_preceding = valid & (preceding_arr[window] == adj_preceding_id)
+            new_following = valid & (following_arr[window] == adj_following_id)
+
+            # Original preceding vehicle becomes left or right adjacent lane preceding vehicle
+            # (original_preceding_id is valid, so a match is a valid ID)
+            original_as_left = valid & (left_preceding_arr[window] == original_preceding_id)
+            original_as_adj = original_as_left | (valid & (right_preceding_arr[window] == original_preceding_id))
+
+            found_new_preceding = bool(new_preceding.any())
+            found_new_following = bool(new_following.any())
+            found_original_preceding_as_adj = bool(original_as_adj.any())
+
+            if found_original_preceding_as_adj:
+                k = np.argmax(original_as_adj)
+                if original_as_left[k]:
+                    new_adj_preceding_field = 'leftPrecedingId'
+                    if VERBOSE:
+                        log.append(f"Frame {frames[i + k]}: original preceding vehicle "
+                                   f"{original_preceding_id} becomes left adjacent lane preceding")
                 else:
-                    if new_lane > old_lane:
-                        direction = 'right'
-                        preceding_id_field = 'rightPrecedingId'
-                        following_id_field = 'rightFollowingId'
-                    else:
-                        direction = 'left'
-                        preceding_id_field = 'leftPrecedingId'
-                        following_id_field = 'leftFollowingId'
-
-                print(f"\nVehicle {vid}: driving direction{driving_direction}, "
-                      f"lane {old_lane}->{new_lane}, determined as {direction} lane change")
-
-                # Check conditions in the frame before lane change
-                # Requirement: Current lane preceding vehicle, adjacent lane preceding vehicle,
-                # and adjacent lane following vehicle must all exist
-                if not (is_valid_id(prev_row['precedingId']) and
-                        is_valid_id(prev_row[preceding_id_field]) and
-                        is_valid_id(prev_row[following_id_field])):
-                    print(f"Does not meet pre-lane-change conditions: has ID 0")
-                    continue
-
-                # Get key IDs
-                original_preceding_id = int(prev_row['precedingId'])
-                adj_preceding_id = int(prev_row[preceding_id_field])
-                adj_following_id = int(prev_row[following_id_field])
-
-                print(f"Before lane change: current lane preceding={original_preceding_id}, "
-                      f"{preceding_id_field}={adj_preceding_id}, "
-                      f"{following_id_field}={adj_following_id}")
-
-                # Find lane change completion frame (adjacent lane vehicles become current lane vehicles)
-                change_complete_frame = None
-                found_new_preceding = False
-                found_new_following = False
-                found_original_preceding_as_adj = False
-                new_adj_preceding_field = None
-
-                # Check up to 50 frames after lane change
-                for j in range(i, min(i + 50, len(df))):
-                    post_row = df.iloc[j]
-
-                    # Check if current lane preceding and following vehicles are valid
-                    if not (is_valid_id(post_row['precedingId']) and is_valid_id(post_row['followingId'])):
-                        continue
-
-                    # Check if adj_preceding_id becomes precedingId
-                    if int(post_row['precedingId']) == adj_preceding_id:
-                        found_new_preceding = True
-
-                    # Check if adj_following_id becomes followingId
-                    if int(post_row['followingId']) == adj_following_id:
-                        found_new_following = True
-
-                    # Check if original preceding vehicle becomes adjacent lane preceding vehicle
-                    if not found_original_preceding_as_adj:
-                        # Check left adjacent lane
-                        if is_valid_id(post_row['leftPrecedingId']) and int(
-                                post_row['leftPrecedingId']) == original_preceding_id:
-                            found_original_preceding_as_adj = True
-                            new_adj_preceding_field = 'leftPrecedingId'
-                            print(f"Frame {post_row['frame']}: original preceding vehicle "
-                                  f"{original_preceding_id} becomes left adjacent lane preceding")
-
-                        # Check right adjacent lane
-                        elif is_valid_id(post_row['rightPrecedingId']) and int(
-                                post_row['rightPrecedingId']) == original_preceding_id:
-                            found_original_preceding_as_adj = True
-                            new_adj_preceding_field = 'rightPrecedingId'
-                            print(f"  Frame {post_row['frame']}: original preceding vehicle "
-                                  f"{original_preceding_id} becomes right adjacent lane preceding")
-                    # When all three conditions are met, consider lane change completed
-                    if found_new_preceding and found_new_following and found_original_preceding_as_adj:
-                        change_complete_frame = post_row['frame']
-                        break
-
-                # Check if all conditions are met
-                conditions = {
-                    'found_new_preceding': found_new_preceding,
-                    'found_new_following': found_new_following,
-                    'found_original_preceding_as_adj': found_original_preceding_as_adj
-                }
-
-                if not all(conditions.values()):
-                    failed_conditions = [k for k, v in conditions.items() if not v]
-                    print(f"Does not meet post-lane-change conditions: {', '.join(failed_conditions)}")
-                    continue
-
-                print(f"Post-lane-change conditions satisfied, completion frame: {change_complete_frame}")
-                print(f"After lane change, original preceding vehicle {original_preceding_id} becomes {new_adj_preceding_field}")
-
-                # Extract trajectory segment: centered around lane change completion frame
-                center_frame = change_complete_frame
-                start_frame = max(df.iloc[0]['frame'], center_frame - PRE_FRAMES)
-                end_frame = min(df.iloc[-1]['frame'], center_frame + POST_FRAMES)
-
-                # Check if trajectory segment length is complete
-                expected_frames = PRE_FRAMES + POST_FRAMES + 1
-                segment_df = df[(df['frame'] >= start_frame) & (df['frame'] <= end_frame)].copy()
-
-                if len(segment_df) != expected_frames:
-                    print(f"Trajectory segment length incomplete: {len(segment_df)} frames, expected {expected_frames} frames")
-                    continue
-
-                print(f"Extract trajectory segment: {start_frame}-{end_frame} ({len(segment_df)} frames)")
-
-                # Check ID validity and consistency throughout the entire trajectory segment
-                all_ids_valid = True
-                for idx, row in segment_df.iterrows():
-                    # Determine which IDs to check based on time
-                    if row['frame'] < change_complete_frame:
-                        # Before lane change completion: check current lane preceding, adjacent lane preceding and following
-                        # Need to check not only ID validity but also ID value consistency
-                        if not (is_valid_id(row['precedingId']) and
-                                int(row['precedingId']) == original_preceding_id and
-                                is_valid_id(row[preceding_id_field]) and
-                                int(row[preceding_id_field]) == adj_preceding_id and
-                                is_valid_id(row[following_id_field]) and
-                                int(row[following_id_field]) == adj_following_id):
-                            all_ids_valid = False
-                            print(f"Pre-lane-change frame {row['frame']}: ID mismatch or invalid")
-                            print(f"Expected: precedingId={original_preceding_id}, "
-                                  f"{preceding_id_field}={adj_preceding_id}, "
-                                  f"{following_id_field}={adj_following_id}")
-                            print(f"Actual: precedingId={row['precedingId']}, "
-                                  f"{preceding_id_field}={row[preceding_id_field]}, "
-                                  f"{following_id_field}={row[following_id_field]}")
-                            break
-                    else:
-                        # After lane change completion: check current lane preceding and following
-                        # Check ID value consistency
-                        if not (is_valid_id(row['precedingId']) and
-                                int(row['precedingId']) == adj_preceding_id and
-                                is_valid_id(row['followingId']) and
-                                int(row['followingId']) == adj_following_id):
-                            all_ids_valid = False
-                            print(f"Post-lane-change frame {row['frame']}: ID mismatch or invalid")
-                            print(f"Expected: precedingId={adj_preceding_id}, followingId={adj_following_id}")
-                            print(f"Actual: precedingId={row['precedingId']}, followingId={row['followingId']}")
-                            break
-
-                if not all_ids_valid:
-                    print(f"Trajectory segment ID check failed")
-                    continue
-
-                print(f"Trajectory segment ID check passed")
-
-                # Check if original preceding vehicle has complete trajectory data in the entire segment
-                print(f"Checking trajectory of original preceding vehicle {original_preceding_id} in the entire segment...")
-                if not has_trajectory_in_range(tracks, original_preceding_id, start_frame, end_frame):
-                    print(f"Original preceding vehicle {original_preceding_id} has incomplete trajectory"
-                          f"in frame range {start_frame}-{end_frame}")
-                    continue
-
-                # Check if adjacent lane preceding vehicle after lane change has complete trajectory data in the entire segment
-                print(f"Checking trajectory of adjacent lane preceding vehicle {adj_preceding_id} in the entire segment...")
-                if not has_trajectory_in_range(tracks, adj_preceding_id, start_frame, end_frame):
-                    print(f"  Adjacent lane preceding vehicle {adj_preceding_id} after lane change has incomplete trajectory "
-                          f"in frame range {start_frame}-{end_frame}")
-                    continue
-
-                # Check if adjacent lane following vehicle after lane change has complete trajectory data in the entire segment
-                print(f"Checking trajectory of adjacent lane following vehicle {adj_following_id} in the entire segment...")
-                if not has_trajectory_in_range(tracks, adj_following_id, start_frame, end_frame):
-                    print(f"Adjacent lane following vehicle {adj_following_id} after lane change has incomplete trajectory "
-                          f"in frame range {start_frame}-{end_frame}")
-                    continue
-
-                print(f"All related vehicles have complete trajectories within the segment")
-
-                # All conditions satisfied, save trajectory segment
-                segment_df['round_up_id'] = len(round_up_info) + 1
-                segment_df['round_up_frame'] = round_up_frame
-                segment_df['change_complete_frame'] = change_complete_frame
-                segment_df['round_up_direction'] = direction
-                segment_df['driving_direction'] = driving_direction
-                segment_df['old_lane'] = old_lane
-                segment_df['new_lane'] = new_lane
-                segment_df['adj_preceding_id'] = adj_preceding_id
-                segment_df['adj_following_id'] = adj_following_id
-                segment_df['original_preceding_id'] = original_preceding_id
-
-                round_up_data.append(segment_df)
-
-                # Save scene information
-                info = {
-                    'scene_id': len(round_up_info) + 1,
-                    'vehicle_id': vid,
-                    'driving_direction': driving_direction,
-                    'round_up_frame': round_up_frame,
-                    'change_complete_frame': change_complete_frame,
-                    'direction': direction,
-                    'old_lane': old_lane,
-                    'new_lane': new_lane,
-                    'start_frame': start_frame,
-                    'end_frame': end_frame,
-                    'adj_preceding_id': adj_preceding_id,
-                    'adj_following_id': adj_following_id,
-                    'original_preceding_id': original_preceding_id,
-                    'num_frames': len(segment_df),
-                    'pre_frames': change_complete_frame - start_frame,
-                    'post_frames': end_frame - change_complete_frame
-                }
-                round_up_info.append(info)
-
-                print(f"Successfully extracted scene {len(round_up_info)}")
-
-                break
+                    new_adj_preceding_field = 'rightPrecedingId'
+                    if VERBOSE:
+                        log.append(f"  Frame {frames[i + k]}: original preceding vehicle "
+                                   f"{original_preceding_id} becomes right adjacent lane preceding")
+
+            # When all three conditions are met, consider lane change completed
+            if found_new_preceding and found_new_following and found_original_preceding_as_adj:
+                completed = (np.logical_or.accumulate(new_preceding) & np.logical_or.accumulate(new_following)
+                             & np.logical_or.accumulate(original_as_adj))
+                change_complete_frame = frames[i + np.argmax(completed)]
+
+            # Check if all conditions are met
+            conditions = {
+                'found_new_preceding': found_new_preceding,
+                'found_new_following': found_new_following,
+                'found_original_preceding_as_adj': found_original_preceding_as_adj
+            }
+
+            if not all(conditions.values()):
+                failed_conditions = [k for k, v in conditions.items() if not v]
+                if VERBOSE:
+                    log.append(f"Does not meet post-lane-change conditions: {', '.join(failed_conditions)}")
+                continue
+
+            if VERBOSE:
+                log.append(f"Post-lane-change conditions satisfied, completion frame: {change_complete_frame}")
+                log.append(f"After lane change, original preceding vehicle {original_preceding_id} becomes {new_adj_preceding_field}")
+
+            # Extract trajectory segment: centered around lane change completion frame
+            center_frame = change_complete_frame
+            start_frame = max(frames[0], center_frame - PRE_FRAMES)
+            end_frame = min(frames[-1], center_frame + POST_FRAMES)
+
+            # Check if trajectory segment length is complete
+            expected_frames = PRE_FRAMES + POST_FRAMES + 1
+            # Frames of a vehicle are sorted: the segment is a slice of its rows (views, no copy)
+            lo, hi = np.searchsorted(frames, [start_frame, end_frame + 1])
+            segment = slice(lo, hi)
+            segment_length = hi - lo
+
+            if segment_length != expected_frames:
+                if VERBOSE:
+                    log.append(f"Trajectory segment length incomplete: {segment_length} frames, expected {expected_frames} frames")
+                continue
+
+            if VERBOSE:
+                log.append(f"Extract trajectory segment: {start_frame}-{end_frame} ({segment_length} frames)")
+
+            # Check ID validity and consistency throughout the entire trajectory segment
+            # (expected IDs are valid, so matching them also implies validity)
+            segment_frames = frames[segment]
+            segment_preceding = preceding_arr[segment]
+            segment_following = following_arr[segment]
+            segment_adj_preceding = columns[preceding_id_field][segment]
+            segment_adj_following = columns[following_id_field][segment]
+
+            # Before lane change completion: current lane preceding, adjacent lane preceding and following
+            # After lane change completion: current lane preceding and following
+            before_complete = segment_frames < change_complete_frame
+            ok_before = ((segment_preceding == original_preceding_id) &
+                         (segment_adj_preceding == adj_preceding_id) &
+                         (segment_adj_following == adj_following_id))
+            ok_after = (segment_preceding == adj_preceding_id) & (segment_following == adj_following_id)
+            ids_ok = np.where(before_complete, ok_before, ok_after)
+            all_ids_valid = bool(ids_ok.all())
+
+            if VERBOSE and not all_ids_valid:
+                k = np.argmin(ids_ok)
+                if before_complete[k]:
+                    log.append(f"Pre-lane-change frame {segment_frames[k]}: ID mismatch or invalid")
+                    log.append(f"Expected: precedingId={original_preceding_id}, "
+                               f"{preceding_id_field}={adj_preceding_id}, "
+                               f"{following_id_field}={adj_following_id}")
+                    log.append(f"Actual: precedingId={segment_preceding[k]}, "
+                               f"{preceding_id_field}={segment_adj_preceding[k]}, "
+                               f"{following_id_field}={segment_adj_following[k]}")
+                else:
+                    log.append(f"Post-lane-change frame {segment_frames[k]}: ID mismatch or invalid")
+                    log.append(f"Expected: precedingId={adj_preceding_id}, followingId={adj_following_id}")
+                    log.append(f"Actual: precedingId={segment_preceding[k]}, followingId={segment_following[k]}")
+
+            if not all_ids_valid:
+                if VERBOSE:
+                    log.append(f"Trajectory segment ID check failed")
+                continue
+
+            if VERBOSE:
+                log.append(f"Trajectory segment ID check passed")
+
+            # Check if the original preceding vehicle and the adjacent lane preceding and following vehicles
+            # have complete trajectory data in the entire segment
+            if VERBOSE:
+                log.append(f"Checking trajectories of vehicles {original_preceding_id}, {adj_preceding_id} "
+                           f"and {adj_following_id} in the entire segment...")
+            incomplete_id = find_incomplete_trajectory(id_to_frames,
+                                                       (original_preceding_id, adj_preceding_id, adj_following_id),
+                                                       start_frame, end_frame)
+            if incomplete_id is not None:
+                if VERBOSE:
+                    log.append(f"Vehicle {incomplete_id} has incomplete trajectory in frame range {start_frame}-{end_frame}")
+                continue
+
+            if VERBOSE:
+                log.append(f"All related vehicles have complete trajectories within the segment")
+
+            # All conditions satisfied, record rows of the trajectory segment in tracks
+            round_up_rows.append(np.arange(vehicle.start + lo, vehicle.start + hi))
+
+            # Save scene information
+            info = {
+                'scene_id': len(round_up_info) + 1,
+                'vehicle_id': vid,
+                'driving_direction': driving_direction,
+                'round_up_frame': round_up_frame,
+                'change_complete_frame': change_complete_frame,
+                'direction': direction,
+                'old_lane': old_lane,
+                'new_lane': new_lane,
+                'start_frame': start_frame,
+                'end_frame': end_frame,
+                'adj_preceding_id': adj_preceding_id,
+                'adj_following_id': adj_following_id,
+                'original_preceding_id': original_preceding_id,
+                'num_frames': segment_length,
+                'pre_frames': change_complete_frame - start_frame,
+                'post_frames': end_frame - change_complete_frame
+            }
+            round_up_info.append(info)
+
+            log.append(f"Successfully extracted scene {len(round_up_info)}")
+
+            break
 
     # Save results
-    if round_up_data:
-        # Merge all trajectory segments
-        result = pd.concat(round_up_data)
-        result = result.sort_values(['round_up_id', 'frame'])
+    if round_up_info:
+        info_df = pd.DataFrame(round_up_info).astype(INFO_DTYPES)
+
+        # Gather all trajectory segments in one go and attach their scene information;
+        # segments are collected in round_up_id order with frames sorted, so no sort is needed
+        result = tracks.iloc[np.concatenate(round_up_rows)].reset_index(drop=True)
+        repeats = info_df['num_frames'].to_numpy()
+        result = result.assign(**{column: np.repeat(info_df[key].to_numpy(), repeats)
+                                  for column, key in SEGMENT_INFO_COLUMNS})
 
         # Save trajectory data
         result.to_csv(save_path, index=False)
 
         # Save scene information
-        info_df = pd.DataFrame(round_up_info)
         info_df.to_csv(info_path, index=False)
 
         unique_vehicles = result['id'].nunique()
-        unique_scenes = len(round_up_data)
+        unique_scenes = len(round_up_info)
 
-        print("\n" + "=" * 70)
-        print(f"File {file_id:02d} extraction statistics:")
-        print(f"Total found {unique_scenes} qualifying lane change scenarios")
-        print(f"Involving {unique_vehicles} different vehicles")
-        print(f"Total trajectory segment length: {len(result)} rows")
-        print(f"Average length per scenario: {len(result) / unique_scenes:.1f} frames")
+        log.append("\n" + "=" * 70)
+        log.append(f"File {file_id:02d} extraction statistics:")
+        log.append(f"Total found {unique_scenes} qualifying lane change scenarios")
+        log.append(f"Involving {unique_vehicles} different vehicles")
+        log.append(f"Total trajectory segment length: {len(result)} rows")
+        log.append(f"Average length per scenario: {len(result) / unique_scenes:.1f} frames")
 
-        print(f"Trajectory data saved to: {save_path}")
-        print(f"Scene information saved to: {info_path}")
-        print("=" * 70)
+        log.append(f"Trajectory data saved to: {save_path}")
+        log.append(f"Scene information saved to: {info_path}")
+        log.append("=" * 70)
 
     else:
-        print(f"File {file_id:02d}: No qualifying lane change behavior found")
+        log.append(f"File {file_id:02d}: No qualifying lane change behavior found")
 
-    return len(round_up_data)
+    return len(round_up_info), log
 
 def main():
     """Automatically process 60 files, preserving original output format"""
@@ -342,25 +390,41 @@ def main():
 
     total_scenes = 0
 
-    # Process 60 files
+    # Collect the 60 files that exist, listing the data directory once
+    if os.path.isdir(base_data_dir):
+        available_files = set(os.listdir(base_data_dir))
+    else:
+        print(f"Data directory {base_data_dir} not found")
+        available_files = set()
+    file_ids = []
+    tracksMeta_paths = []
+    tracks_paths = []
     for file_id in range(1, 61):
-        # Construct file paths
-        tracksMeta_path = os.path.join(base_data_dir, f"{file_id:02d}_tracksMeta.csv")
-        tracks_path = os.path.join(base_data_dir, f"{file_id:02d}_tracks.csv")
+        # Construct file names
+        tracksMeta_name = f"{file_id:02d}_tracksMeta.csv"
+        tracks_name = f"{file_id:02d}_tracks.csv"
 
         # Check if files exist
-        if not os.path.exists(tracksMeta_path) or not os.path.exists(tracks_path):
+        if tracksMeta_name not in available_files or tracks_name not in available_files:
             print(f"\nFile {file_id:02d} does not exist, skipping")
             continue
 
-        # Process current file
-        scenes_count = process_file(tracksMeta_path, tracks_path, save_dir, file_id)
-        total_scenes += scenes_count
+        file_ids.append(file_id)
+        tracksMeta_paths.append(os.path.join(base_data_dir, tracksMeta_name))
+        tracks_paths.append(os.path.join(base_data_dir, tracks_name))
+
+    # Process files in parallel
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        results = executor.map(process_file, tracksMeta_paths, tracks_paths, repeat(save_dir), file_ids)
+        for file_id, (scenes_count, log) in zip(file_ids, results):
+            print('\n'.join(log))
+            total_scenes += scenes_count
 
-        print(f"File {file_id:02d} processing completed, found {scenes_count} scenarios")
+            print(f"File {file_id:02d} processing completed, found {scenes_count} scenarios")
 
     print("\n" + "=" * 70)
     print(f"Total found {total_scenes} qualifying lane change scenarios across 60 files")
     print("=" * 70)
 
-main()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
\ No newline at end of file
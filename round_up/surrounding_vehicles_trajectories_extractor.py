@@ -10,16 +10,24 @@ Also extracts the lane-changing vehicle's trajectory for reference.
 All trajectories are extracted within the same frame range as the lane change event.
 """
 import pandas as pd
+import numpy as np
 import os
+import sys
 import glob
 import re
+from concurrent.futures import ProcessPoolExecutor
+
+# Shared HighD helpers live in highd_io.py at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from highd_io import load_tracks
 
 # 1. Set base data directories
 changing_dir = './output/lane_change_trajectories'               # Directory for saving lane_change vehicle trajectories
 #changing_dir = './output/lane_change_trajectories_filtered'     # Directory for speed-filtered results (if speed filtered)
 tracks_dir = './data/highD-dataset-v1.0'                         # HighD dataset directory
+cache_dir = './output/tracks_cache'                              # Directory for caching parsed HighD tracks
 
-# 2. Create output directories
+# 2. Output directories by role
 output_dirs = {
     'adj_preceding': './output/surround_data/adj_preceding_data',
     'adj_following': './output/surround_data/adj_following_data',
@@ -27,30 +35,32 @@ output_dirs = {
     'changing_vehicle': './output/surround_data/changing_vehicle_data'
 }
 
-for role, dir_path in output_dirs.items():
-    os.makedirs(dir_path, exist_ok=True)
-    print(f"Created directory: {dir_path}")
+MAX_WORKERS = None    # Worker processes for scenes (None uses all CPU cores)
+
+
+# Helper function: Scene number of a changing file, so that scenes are processed in scene_id order
+def scene_number(changing_file):
+    match = re.search(r'changing_info_(\d+)', os.path.basename(changing_file))
+    return int(match.group(1)) if match else -1
 
-# 3. Find all changing files
-changing_files = glob.glob(os.path.join(changing_dir, 'changing_info_*.csv'))
-#changing_files = glob.glob(os.path.join(changing_dir, 'changing_info_*_clear.csv'))      # if speed filtered
-print(f"Found {len(changing_files)} changing files")
 
-# 4. Find corresponding tracks files for each changing file
-summary_data = []
+# 4. Extract trajectories of target vehicles for a single scene
+def process_scene(changing_file):
+    """Return the scene summary and its trajectory segments by role (None if the scene is skipped), and its messages"""
+    # Messages are collected and printed by the main process in scene order
+    log = []
 
-# Initialize trajectory lists by role
-role_trajectories = {role: [] for role in output_dirs.keys()}
+    # Initialize trajectory lists by role
+    role_trajectories = {role: [] for role in output_dirs.keys()}
 
-for changing_file in changing_files:
     # Extract scene number from filename
     file_name = os.path.basename(changing_file)
     match = re.search(r'changing_info_(\d+)\.csv', file_name)
     #match = re.search(r'changing_info_(\d+)_clear\.csv', file_name)       # if speed filtered
 
     if not match:
-        print(f"Warning: Unable to extract scene number from filename {file_name}, skipping")
-        continue
+        log.append(f"Warning: Unable to extract scene number from filename {file_name}, skipping")
+        return None, log
 
     scene_num = match.group(1)
     scene_id = int(scene_num)
@@ -60,30 +70,35 @@ for changing_file in changing_files:
 
     # Check if tracks file exists
     if not os.path.exists(tracks_file):
-        print(f"Warning: Corresponding tracks file not found: {tracks_file}")
+        log.append(f"Warning: Corresponding tracks file not found: {tracks_file}")
         # Try alternative naming format
         tracks_file_alt = os.path.join(tracks_dir, f'{scene_num}_tracks.csv')
         if os.path.exists(tracks_file_alt):
             tracks_file = tracks_file_alt
         else:
-            print(f"Error: Unable to find trajectory file for scene {scene_num}, skipping")
-            continue
+            log.append(f"Error: Unable to find trajectory file for scene {scene_num}, skipping")
+            return None, log
 
-    print(f"\n{'=' * 60}")
-    print(f"Processing Scene {scene_num}:")
-    print(f"Changing file: {file_name}")
-    print(f"Tracks file: {os.path.basename(tracks_file)}")
+    log.append(f"\n{'=' * 60}")
+    log.append(f"Processing Scene {scene_num}:")
+    log.append(f"Changing file: {file_name}")
+    log.append(f"Tracks file: {os.path.basename(tracks_file)}")
 
     # 5. Load data
     try:
         changing_df = pd.read_csv(changing_file)
-        tracks_df = pd.read_csv(tracks_file)
+        tracks_df = load_tracks(tracks_file, cache_dir)
     except Exception as e:
-        print(f"Error: Failed to read files - {e}")
-        continue
+        log.append(f"Error: Failed to read files - {e}")
+        return None, log
 
-    print(f"Read {len(changing_df)} lane change events")
-    print(f"Trajectory data has {len(tracks_df)} rows")
+    log.append(f"Read {len(changing_df)} lane change events")
+    log.append(f"Trajectory data has {len(tracks_df)} rows")
+
+    # Index the rows of each vehicle once, sorted by frame
+    tracks_df = tracks_df.sort_values(['id', 'frame'], kind='stable').reset_index(drop=True)
+    id_to_rows = tracks_df.groupby('id', sort=False).indices
+    track_frames = tracks_df['frame'].to_numpy()
 
     # Count extraction by role for current scene
     scene_role_counts = {role: 0 for role in output_dirs.keys()}
@@ -95,9 +110,9 @@ for changing_file in changing_files:
         vehicle_id = event['vehicle_id']
         event_id = f"scene{scene_num}_event{event_idx + 1}"
 
-        print(f"\nProcessing event {event_idx + 1}: vehicle {vehicle_id}")
-        print(f"Time range: frames {start_frame} to {end_frame}")
-        print(f"Direction: {event['direction']} ({event['old_lane']} -> {event['new_lane']})")
+        log.append(f"\nProcessing event {event_idx + 1}: vehicle {vehicle_id}")
+        log.append(f"Time range: frames {start_frame} to {end_frame}")
+        log.append(f"Direction: {event['direction']} ({event['old_lane']} -> {event['new_lane']})")
 
         extraction_targets = []
 
@@ -139,45 +154,47 @@ for changing_file in changing_files:
             target_desc = target['description']
 
             # Extract complete trajectory of this vehicle
-            target_traj = tracks_df[tracks_df['id'] == target_id].copy()
+            rows = id_to_rows.get(target_id)
 
-            if len(target_traj) == 0:
-                print(f"{target_desc} (ID: {target_id}): No trajectory found")
+            if rows is None:
+                log.append(f"{target_desc} (ID: {target_id}): No trajectory found")
                 continue
 
             # Extract trajectory segment within event time range
-            target_traj_segment = target_traj[
-                (target_traj['frame'] >= start_frame) &
-                (target_traj['frame'] <= end_frame)
-                ].copy()
+            frames = track_frames[rows]
+            lo = np.searchsorted(frames, start_frame, side='left')
+            hi = np.searchsorted(frames, end_frame, side='right')
+            target_traj_segment = tracks_df.iloc[rows[lo:hi]]
 
             if len(target_traj_segment) == 0:
-                print(f"{target_desc} (ID: {target_id}): No data in specified time range")
+                log.append(f"{target_desc} (ID: {target_id}): No data in specified time range")
                 continue
 
             # Add event information
-            target_traj_segment['scene_id'] = scene_id
-            target_traj_segment['event_id'] = event_id
-            target_traj_segment['vehicle_role'] = target_role
-            target_traj_segment['role_description'] = target_desc
-            target_traj_segment['changing_vehicle_id'] = int(event['vehicle_id'])
-            target_traj_segment['event_start_frame'] = start_frame
-            target_traj_segment['event_end_frame'] = end_frame
-            target_traj_segment['changing_frame'] = event['changing_frame']
-            target_traj_segment['driving_direction'] = event['driving_direction']
-            target_traj_segment['direction'] = event['direction']
-            target_traj_segment['old_lane'] = event['old_lane']
-            target_traj_segment['new_lane'] = event['new_lane']
-            target_traj_segment['source_changing_file'] = file_name
-            target_traj_segment['source_tracks_file'] = os.path.basename(tracks_file)
+            target_traj_segment = target_traj_segment.assign(
+                scene_id=scene_id,
+                event_id=event_id,
+                vehicle_role=target_role,
+                role_description=target_desc,
+                changing_vehicle_id=int(event['vehicle_id']),
+                event_start_frame=start_frame,
+                event_end_frame=end_frame,
+                changing_frame=event['changing_frame'],
+                driving_direction=event['driving_direction'],
+                direction=event['direction'],
+                old_lane=event['old_lane'],
+                new_lane=event['new_lane'],
+                source_changing_file=file_name,
+                source_tracks_file=os.path.basename(tracks_file)
+            )
 
             role_trajectories[target_role].append(target_traj_segment)
             scene_role_counts[target_role] += 1
 
-            print(f"{target_desc} (ID: {target_id}): Extracted {len(target_traj_segment)} frames")
+            log.append(f"{target_desc} (ID: {target_id}): Extracted {len(target_traj_segment)} frames")
 
     # Record scene summary information
-    summary_data.append({
+    summary = {
         'scene_id': scene_id,
         'changing_file': file_name,
         'tracks_file': os.path.basename(tracks_file),
@@ -187,72 +204,112 @@ for changing_file in changing_files:
         'original_preceding_count': scene_role_counts['original_preceding'],
         'changing_vehicle_count': scene_role_counts['changing_vehicle'],
         'total_extracted': sum(scene_role_counts.values())
-    })
-
-    print(f"\nScene {scene_num} extraction statistics:")
-
-# 7. Save data by role separately
-for role, trajectories in role_trajectories.items():
-    if trajectories:
-        # Merge all trajectories for this role
-        result_df = pd.concat(trajectories, ignore_index=True)
-
-        # Sort by scene_id, event_id and frame
-        result_df = result_df.sort_values(['scene_id', 'event_id', 'frame'])
-
-        # Save file path
-        save_path = os.path.join(output_dirs[role], f'all_{role}_trajectories.csv')
-
-        result_df.to_csv(save_path, index=False)
-
-        print(f"Save path: {save_path}")
-        print(f"Total data rows: {len(result_df)}")
-        print(f"Unique vehicle count: {result_df['id'].nunique()}")
-        print(f"Unique event count: {result_df['event_id'].nunique()}")
-        print(f"Number of scenes involved: {result_df['scene_id'].nunique()}")
-
-        # Save separate files by scene
-        scenes = result_df['scene_id'].unique()
-        for scene in scenes:
-            scene_data = result_df[result_df['scene_id'] == scene]
-            scene_save_path = os.path.join(output_dirs[role], f'scene{scene:02d}_{role}_trajectories.csv')
-            scene_data.to_csv(scene_save_path, index=False)
-
-        print(f"Saved {len(scenes)} separate files by scene")
-    else:
-        print(f"\n{role}: No trajectory data")
-
-# 8. Save summary information
-if summary_data:
-    summary_df = pd.DataFrame(summary_data)
-
-    totals = {
-        'scene_id': 'Total',
-        'changing_file': '-',
-        'tracks_file': '-',
-        'total_events': summary_df['total_events'].sum(),
-        'adj_preceding_count': summary_df['adj_preceding_count'].sum(),
-        'adj_following_count': summary_df['adj_following_count'].sum(),
-        'original_preceding_count': summary_df['original_preceding_count'].sum(),
-        'changing_vehicle_count': summary_df['changing_vehicle_count'].sum(),
-        'total_extracted': summary_df['total_extracted'].sum()
     }
 
-    summary_df = pd.concat([summary_df, pd.DataFrame([totals])], ignore_index=True)
-    summary_path = os.path.join(output_dirs['changing_vehicle'], '..', 'extraction_summary.csv')
-    summary_df.to_csv(summary_path, index=False)
-
-    print(f"\n{'=' * 60}")
-    print("Summary information:")
-    print(f"Total scenes processed: {len(summary_data)}")
-    print(f"Total lane change events: {totals['total_events']}")
-    print(f"\n Extraction statistics by role:")
-    print(f"Adjacent lane preceding vehicle: {totals['adj_preceding_count']} trajectories")
-    print(f"Adjacent lane following vehicle: {totals['adj_following_count']} trajectories")
-    print(f"Original lane preceding vehicle: {totals['original_preceding_count']} trajectories")
-    print(f"Lane-changing vehicle: {totals['changing_vehicle_count']} trajectories")
-    print(f"Total: {totals['total_extracted']} trajectories")
-    print(f"\nSummary file saved to: {summary_path}")
+    log.append(f"\nScene {scene_num} extraction statistics:")
+
+    # Save separate files by scene, sorted by event_id and frame
+    scene_trajectories = {}
+    for role, trajectories in role_trajectories.items():
+        if trajectories:
+            scene_df = pd.concat(trajectories, ignore_index=True).sort_values(['event_id', 'frame'])
+            scene_save_path = os.path.join(output_dirs[role], f'scene{scene_id:02d}_{role}_trajectories.csv')
+            scene_df.to_csv(scene_save_path, index=False)
+            scene_trajectories[role] = scene_df
+
+    return (summary, scene_trajectories), log
+
+
+def main():
+    """Extract surrounding vehicle trajectories of all scenes in parallel, then save them by role"""
+    # Create output directories
+    for role, dir_path in output_dirs.items():
+        os.makedirs(dir_path, exist_ok=True)
+        print(f"Created directory: {dir_path}")
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # 3. Find all changing files
+    changing_files = sorted(glob.glob(os.path.join(changing_dir, 'changing_info_*.csv')), key=scene_number)
+    #changing_files = sorted(glob.glob(os.path.join(changing_dir, 'changing_info_*_clear.csv')), key=scene_number)      # if speed filtered
+    print(f"Found {len(changing_files)} changing files")
+
+    summary_data = []
+
+    # Per-role statistics of the saved trajectories
+    save_paths = {role: os.path.join(output_dirs[role], f'all_{role}_trajectories.csv') for role in output_dirs}
+    role_rows = {role: 0 for role in output_dirs}
+    role_vehicles = {role: set() for role in output_dirs}
+    role_events = {role: 0 for role in output_dirs}
+    role_scenes = {role: 0 for role in output_dirs}
+
+    # Process scenes in parallel; scenes arrive in scene_id order and their trajectories
+    # (already sorted by event_id and frame) are appended to the role files as they come
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for result, log in executor.map(process_scene, changing_files):
+            print('\n'.join(log))
+
+            if result is None:
+                continue
+
+            summary, scene_trajectories = result
+            summary_data.append(summary)
+
+            # 7. Save data by role separately
+            for role, scene_df in scene_trajectories.items():
+                first_write = role_rows[role] == 0
+                scene_df.to_csv(save_paths[role], mode='w' if first_write else 'a', header=first_write, index=False)
+
+                role_rows[role] += len(scene_df)
+                role_vehicles[role].update(scene_df['id'].unique().tolist())
+                role_events[role] += scene_df['event_id'].nunique()
+                role_scenes[role] += 1
+
+    for role in output_dirs:
+        if role_rows[role]:
+            print(f"Save path: {save_paths[role]}")
+            print(f"Total data rows: {role_rows[role]}")
+            print(f"Unique vehicle count: {len(role_vehicles[role])}")
+            print(f"Unique event count: {role_events[role]}")
+            print(f"Number of scenes involved: {role_scenes[role]}")
+            print(f"Saved {role_scenes[role]} separate files by scene")
+        else:
+            print(f"\n{role}: No trajectory data")
+
+    # 8. Save summary information
+    if summary_data:
+        summary_df = pd.DataFrame(summary_data)
+
+        totals = {
+            'scene_id': 'Total',
+            'changing_file': '-',
+            'tracks_file': '-',
+            'total_events': summary_df['total_events'].sum(),
+            'adj_preceding_count': summary_df['adj_preceding_count'].sum(),
+            'adj_following_count': summary_df['adj_following_count'].sum(),
+            'original_preceding_count': summary_df['original_preceding_count'].sum(),
+            'changing_vehicle_count': summary_df['changing_vehicle_count'].sum(),
+            'total_extracted': summary_df['total_extracted'].sum()
+        }
+
+        summary_df = pd.concat([summary_df, pd.DataFrame([totals])], ignore_index=True)
+        summary_path = os.path.join(output_dirs['changing_vehicle'], '..', 'extraction_summary.csv')
+        summary_df.to_csv(summary_path, index=False)
+
+        print(f"\n{'=' * 60}")
+        print("Summary information:")
+        print(f"Total scenes processed: {len(summary_data)}")
+        print(f"Total lane change events: {totals['total_events']}")
+        print(f"\n Extraction statistics by role:")
+        print(f"Adjacent lane preceding vehicle: {totals['adj_preceding_count']} trajectories")
+        print(f"Adjacent lane following vehicle: {totals['adj_following_count']} trajectories")
+        print(f"Original lane preceding vehicle: {totals['original_preceding_count']} trajectories")
+        print(f"Lane-changing vehicle: {totals['changing_vehicle_count']} trajectories")
+        print(f"Total: {totals['total_extracted']} trajectories")
+        print(f"\nSummary file saved to: {summary_path}")
+        print(f"\nProcessing completed!")
+
     print(f"\nProcessing completed!")
 
-print(f"\nProcessing completed!")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file